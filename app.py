@@ -1,6 +1,10 @@
 import streamlit as st
 import auth
 import db
+import department_dashboard
+import evaluation
+import migrations
+import query_trace
 import user_management
 import template_management
 
@@ -8,8 +12,23 @@ import template_management
 def main():
     st.set_page_config(page_title='KPI考核系统', layout='wide')
     
-    # 初始化数据库
-    db.init_db()
+    # 记录本次重跑的所有查询（st.rerun 中断时也会写入日志）；页面片段单独重跑时的记录保存到会话中
+    query_trace.set_fragment_listener(_keep_fragment_trace)
+    query_trace.start_rerun()
+    page = None
+    try:
+        page = render()
+    finally:
+        summary = query_trace.finish_rerun(page)
+    
+    # 管理员可在侧边栏查看本次重跑的查询统计
+    if st.session_state.get('show_performance_panel'):
+        performance_panel(summary)
+
+# 渲染页面，返回当前页面名称
+def render():
+    # 初始化数据库（每个进程只迁移一次，也可以提前执行 python migrations.py）
+    migrations.ensure_schema()
     
     # 用户认证
     authenticator, name, authentication_status, username = auth.authenticate()
@@ -20,24 +39,63 @@ def main():
         auth.logout(authenticator)
         st.sidebar.title(f'欢迎, {name}')
         
-        # 获取用户凭证
-        credentials = db.get_credentials()
-        user_role = credentials['usernames'][username]['role']
+        # 获取当前用户角色（每次重跑重新查询，其他副本的修改立即生效）
+        profile = auth.get_user_profile(username)
+        if profile is None:
+            # 账号已被删除，但登录 cookie 仍然有效
+            st.error('当前账号已不存在，请退出后重新登录')
+            return '登录'
+        user_role = profile['role']
         
         if user_role == 'admin':
             # 在侧边栏添加导航菜单
             st.sidebar.title('系统管理')
-            menu_selection = st.sidebar.radio('', ['用户管理', '考核模板'])
+            menu_selection = st.sidebar.radio('', ['用户管理', '考核模板', '部门统计'])
+            st.sidebar.checkbox('显示性能面板', key='show_performance_panel')
             
             if menu_selection == '用户管理':
                 user_management.user_management_page()
             elif menu_selection == '考核模板':
                 template_management.template_management_page()
-                # 编辑模板表单
-                template_management.edit_template_form()
+            elif menu_selection == '部门统计':
+                department_dashboard.department_dashboard_page()
+            return menu_selection
         else:
-            st.title('KPI考核系统')
-            st.info('普通用户功能开发中...')
+            evaluation.evaluation_page(profile['account'])
+            return '我的考核'
+    return '登录'
+
+# 保存最近一次页面片段单独重跑的查询汇总，下次整页重跑时在性能面板中显示
+def _keep_fragment_trace(summary):
+    st.session_state['fragment_trace'] = summary
+
+# 管理员侧边栏性能面板
+def performance_panel(summary):
+    if summary is None:
+        return
+    with st.sidebar.expander('性能面板', expanded=True):
+        st.write(f"本次重跑: {summary['rerun_ms']:.1f} ms，查询 {summary['queries']} 次，共 {summary['query_ms']:.1f} ms")
+        fragment = st.session_state.get('fragment_trace')
+        if fragment is not None:
+            st.write(f"最近一次局部重跑（{fragment['page']}）: {fragment['rerun_ms']:.1f} ms，"
+                     f"查询 {fragment['queries']} 次，共 {fragment['query_ms']:.1f} ms")
+        if summary['slow']:
+            st.warning(f"{len(summary['slow'])} 条慢查询（≥ {query_trace.SLOW_QUERY_MS:g} ms）")
+        st.dataframe(
+            summary['statements'],
+            hide_index=True,
+            column_order=['caller', 'count', 'total_ms', 'max_ms', 'rows', 'sql'],
+            column_config={'caller': '调用函数', 'count': '次数', 'total_ms': '总耗时(ms)',
+                           'max_ms': '最长(ms)', 'rows': '行数', 'sql': 'SQL'},
+        )
+        stats = db.get_write_stats()
+        st.write(f"写入队列: 排队 {stats['queue_depth']} 个，已完成 {stats['completed']} 个，失败 {stats['failed']} 个，"
+                 f"平均每次提交 {stats['average_batch_size']:g} 个")
+        st.write(f"写入等待: 平均 {stats['average_wait_ms']:.1f} ms，P95 {stats['p95_wait_ms']:.1f} ms，"
+                 f"最长 {stats['max_wait_ms']:.1f} ms")
+        cache = db.get_read_cache_stats()
+        st.write(f"读缓存: 命中 {cache['hits']} 次，未命中 {cache['misses']} 次（命中率 {cache['hit_rate']:.0%}），"
+                 f"缓存 {cache['entries']} / {cache['max_entries']} 个结果")
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
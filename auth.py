@@ -1,6 +1,7 @@
 import streamlit as st
 import streamlit_authenticator as stauth
 import db
+import passwords
 
 # 用户认证函数
 def authenticate():
@@ -9,15 +10,21 @@ def authenticate():
     
     # 配置认证器
     authenticator = stauth.Authenticate(
-        credentials,
+        {'usernames': {}},
         'kpi_cookie',
         'kpi_key',
         cookie_expiry_days=30
     )
+    # 认证器在初始化时会遍历复制全部用户，这里在初始化后再换回按需查询的映射
+    authenticator.credentials['usernames'] = credentials['usernames']
     
     # 登录界面
     name, authentication_status, username = authenticator.login('登录', location='main')
     
+    # 本次通过表单登录成功时，检查已存储的密码哈希强度是否与配置一致
+    if authentication_status and getattr(authenticator, 'password', None):
+        rehash_if_needed(credentials['usernames'], username, authenticator.password)
+    
     # 处理登录状态
     if authentication_status == False:
         st.error('用户名或密码错误')
@@ -27,6 +34,25 @@ def authenticate():
     # 返回认证信息
     return authenticator, name, authentication_status, username
 
+# 已存储哈希的轮数与配置不同时，用刚输入的密码在后台重新计算
+def rehash_if_needed(usernames, username, password):
+    try:
+        user = usernames[username]
+    except KeyError:
+        return
+    if passwords.needs_rehash(user['password']):
+        db.set_password_async(user['account'], password, expected_hash=user['password'], track=False)
+
+# 获取当前登录用户的信息，每次重跑都按用户名查询一次（走用户名索引）
+# 其他进程或应用副本修改角色、删除用户后，下一次重跑立即生效
+def get_user_profile(username):
+    user = db.get_user_credentials(username)
+    if user is None:
+        return None
+    
+    # account 为数据库中的用户名（登录时用户名不区分大小写）
+    return {'username': username, 'account': user.username, 'name': user.name, 'role': user.role}
+
 # 退出登录
 def logout(authenticator):
     if st.sidebar.button('退出'):
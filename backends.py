@@ -0,0 +1,419 @@
+import queue
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+import query_trace
+
+# PostgreSQL 驱动是可选依赖，只在使用 PostgreSQL 时需要
+try:
+    import psycopg
+except ImportError:
+    psycopg = None
+
+# 数据库后端：默认使用本地 SQLite 文件；配置 PostgreSQL 连接串时使用 PostgreSQL，多个应用副本共享同一个数据库
+# 业务代码统一按 SQLite 方言编写 SQL（? 占位符、BEGIN IMMEDIATE 等），方言差异在本模块中处理
+
+# 两种数据库的异常类型，页面和命令行统一捕获
+DATABASE_ERRORS = (sqlite3.Error, psycopg.Error) if psycopg else (sqlite3.Error,)
+
+# 连接池公共部分：借出连接，正常退出时提交，异常时回滚
+class Pool:
+    dialect = None
+
+    def acquire(self):
+        raise NotImplementedError
+
+    def release(self, conn):
+        raise NotImplementedError
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+            if conn.in_transaction:
+                conn.commit()
+        except BaseException:
+            # 包括提前关闭的生成器（GeneratorExit），连接还回连接池前结束事务
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        finally:
+            self.release(conn)
+
+    # 逐批取出查询结果（导出大表时使用），内存占用只与批大小有关
+    def stream(self, sql, params, chunk_size):
+        with self.connection() as conn:
+            cursor = conn.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    return
+                yield rows
+
+    # 启动时的完整性检查，默认不做
+    def verify_integrity(self):
+        pass
+
+    # 连接看到的数据版本，其他连接提交修改后变化；不支持时返回 None
+    def data_version(self, conn):
+        return None
+
+# ---------- SQLite ----------
+
+# SQLite 连接池：连接创建时设置一次 PRAGMA，之后在多次重跑之间复用
+class SQLitePool(Pool):
+    dialect = 'sqlite'
+
+    def __init__(self, path, size, quick_check_interval=0):
+        self.path = path
+        self.quick_check_interval = quick_check_interval
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._lock = threading.Lock()
+        self._last_quick_check = time.monotonic()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False,
+                               factory=query_trace.TracingConnection)
+        conn.execute('PRAGMA journal_mode=WAL;')  # 使用预写日志模式
+        conn.execute('PRAGMA synchronous=NORMAL;')
+        return conn
+
+    def acquire(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        # 检查失败或出错时关闭连接，不还回连接池
+        try:
+            self._maybe_quick_check(conn)
+        except BaseException:
+            conn.close()
+            raise
+        return conn
+
+    def release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    # 启动时执行完整性检查（全库扫描，只做一次）
+    def verify_integrity(self):
+        conn = self.acquire()
+        try:
+            result = conn.execute('PRAGMA integrity_check;').fetchone()[0]
+        finally:
+            self.release(conn)
+        if result != 'ok':
+            raise sqlite3.DatabaseError(f'数据库完整性检查失败: {result}')
+
+    def data_version(self, conn):
+        return conn.execute('PRAGMA data_version;').fetchone()[0]
+
+    # 按配置的间隔执行 quick_check
+    def _maybe_quick_check(self, conn):
+        if not self.quick_check_interval:
+            return
+        with self._lock:
+            if time.monotonic() - self._last_quick_check < self.quick_check_interval:
+                return
+            self._last_quick_check = time.monotonic()
+        result = conn.execute('PRAGMA quick_check;').fetchone()[0]
+        if result != 'ok':
+            raise sqlite3.DatabaseError(f'数据库完整性检查失败: {result}')
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+# ---------- PostgreSQL ----------
+
+# BEGIN IMMEDIATE 在 PostgreSQL 中改为事务级咨询锁：写事务依次执行，与 SQLite 的单写者语义一致
+WRITE_LOCK_KEY = 20240601
+
+# 需要改写的函数调用
+_CALL = re.compile(r'(?<![\w.])(MIN|MAX|ROUND|CAST|instr)\s*\(', re.IGNORECASE)
+_TRIGGER = re.compile(
+    r'^\s*CREATE TRIGGER IF NOT EXISTS (\w+)\s+(BEFORE|AFTER)\s+(INSERT|DELETE|UPDATE(?: OF [\w\s,]+?)?)\s+ON\s+(\w+)'
+    r'(?:\s+WHEN\s+(.*?))?\s+BEGIN\b(.*)\bEND\s*$',
+    re.IGNORECASE | re.DOTALL
+)
+_RAISE = re.compile(r"SELECT RAISE\(ABORT,\s*('[^']*')\)(?:\s+WHERE\s+([^;]*))?;", re.IGNORECASE)
+_UPSERT = re.compile(r'INSERT INTO (\w+)([^;]*?)ON CONFLICT\s*\(([^)]*)\)\s*DO UPDATE SET(.*?)(?=;|$)',
+                     re.IGNORECASE | re.DOTALL)
+
+# 找到与 start 处左括号匹配的右括号位置
+def _closing_paren(sql, start):
+    depth = 0
+    quote = None
+    for i in range(start, len(sql)):
+        char = sql[i]
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in "'\"":
+            quote = char
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+            if depth == 0:
+                return i
+    raise ValueError(f'括号不匹配: {sql}')
+
+# 按顶层逗号拆分参数列表
+def _split_args(text):
+    args = []
+    depth = 0
+    quote = None
+    current = ''
+    for char in text:
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in "'\"":
+            quote = char
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            args.append(current.strip())
+            current = ''
+            continue
+        current += char
+    args.append(current.strip())
+    return args
+
+# 改写 SQLite 特有的函数调用
+def _rewrite_calls(sql):
+    result = ''
+    position = 0
+    while True:
+        match = _CALL.search(sql, position)
+        if match is None:
+            return result + sql[position:]
+        open_paren = match.end() - 1
+        close_paren = _closing_paren(sql, open_paren)
+        name = match.group(1).upper()
+        args = _split_args(_rewrite_calls(sql[open_paren + 1:close_paren]))
+        if name in ('MIN', 'MAX') and len(args) > 1:
+            # 多参数的 MIN / MAX 是标量函数
+            call = f"{'LEAST' if name == 'MIN' else 'GREATEST'}({', '.join(args)})"
+        elif name == 'ROUND' and len(args) == 2:
+            # PostgreSQL 只有 numeric 版本的 ROUND(x, n)
+            call = f'CAST(ROUND(CAST({args[0]} AS NUMERIC), {args[1]}) AS DOUBLE PRECISION)'
+        elif name == 'CAST' and re.search(r'\s+AS\s+INTEGER$', args[0], re.IGNORECASE):
+            # SQLite 转换为整数时截断小数，PostgreSQL 四舍五入
+            expression = re.sub(r'\s+AS\s+INTEGER$', '', args[0], flags=re.IGNORECASE)
+            call = f'CAST(TRUNC({expression}) AS INTEGER)'
+        elif name == 'INSTR':
+            call = f"strpos({', '.join(args)})"
+        else:
+            call = f"{match.group(1)}({', '.join(args)})"
+        result += sql[position:match.start()] + call
+        position = close_paren + 1
+
+# ON CONFLICT DO UPDATE 中引用原有行的列名必须加表名
+def _qualify_upserts(sql):
+    def qualify(match):
+        table, assignments = match.group(1), match.group(4)
+        columns = [assignment.split('=', 1)[0].strip() for assignment in _split_args(assignments)]
+        parts = []
+        for assignment in _split_args(assignments):
+            column, expression = assignment.split('=', 1)
+            for name in columns:
+                expression = re.sub(rf'(?<![\w.]){name}\b', f'{table}.{name}', expression)
+            parts.append(f'{column.strip()} = {expression.strip()}')
+        return f"INSERT INTO {table}{match.group(2)}ON CONFLICT ({match.group(3)}) DO UPDATE SET {', '.join(parts)}"
+    return _UPSERT.sub(qualify, sql)
+
+# 把 ? 占位符改为 %s（字符串常量中的 ? 保留），并转义 %
+def _placeholders(sql):
+    result = ''
+    quote = None
+    for char in sql:
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in "'\"":
+            quote = char
+        elif char == '?':
+            result += '%s'
+            continue
+        if char == '%':
+            char = '%%'
+        result += char
+    return result
+
+# SQLite 语句改写为 PostgreSQL 语句（可能是多条）
+def _translate_statement(sql):
+    stripped = sql.strip().rstrip(';')
+    if re.fullmatch(r'BEGIN IMMEDIATE', stripped, re.IGNORECASE):
+        return [f'SELECT pg_advisory_xact_lock({WRITE_LOCK_KEY})']
+
+    trigger = _TRIGGER.match(stripped)
+    if trigger:
+        name, timing, event, table, condition, body = trigger.groups()
+        if timing.upper() == 'AFTER':
+            returns = 'NULL'
+        else:
+            returns = 'OLD' if event.upper() == 'DELETE' else 'NEW'
+        when = f' WHEN ({_translate_expression(condition)})' if condition else ''
+        # SELECT RAISE(ABORT, ...) 改为 plpgsql 的 RAISE EXCEPTION
+        body = _RAISE.sub(lambda match: f'IF {match.group(2)} THEN RAISE EXCEPTION {match.group(1)}; END IF;'
+                          if match.group(2) else f'RAISE EXCEPTION {match.group(1)};', body)
+        return [
+            f'CREATE OR REPLACE FUNCTION {name}_fn() RETURNS trigger LANGUAGE plpgsql AS $$ BEGIN '
+            f'{_translate_expression(body)} RETURN {returns}; END $$',
+            f'CREATE OR REPLACE TRIGGER {name} {timing} {event} ON {table} FOR EACH ROW{when} EXECUTE FUNCTION {name}_fn()',
+        ]
+
+    if re.match(r'CREATE TABLE', stripped, re.IGNORECASE):
+        stripped = re.sub(r'INTEGER PRIMARY KEY( AUTOINCREMENT)?', 'INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY',
+                          stripped, flags=re.IGNORECASE)
+        stripped = re.sub(r'\bREAL\b', 'DOUBLE PRECISION', stripped, flags=re.IGNORECASE)
+    return [_translate_expression(stripped)]
+
+# 改写表达式和 DML 中的方言差异
+def _translate_expression(sql):
+    sql = re.sub(r'INSERT OR REPLACE INTO', 'INSERT INTO', sql, flags=re.IGNORECASE)
+    sql = re.sub(r'\bWHERE 1\b', 'WHERE TRUE', sql)
+    # SQLite 的 a IS NOT b 即 PostgreSQL 的 a IS DISTINCT FROM b
+    sql = re.sub(r'\bIS NOT (?!NULL\b|DISTINCT\b)', 'IS DISTINCT FROM ', sql, flags=re.IGNORECASE)
+    sql = _qualify_upserts(_rewrite_calls(sql))
+    return sql
+
+# 改写结果会被反复使用，按语句缓存
+@lru_cache(maxsize=1024)
+def translate(sql):
+    return [_placeholders(statement) for statement in _translate_statement(sql)]
+
+# PostgreSQL 游标：改写语句并记录查询耗时，接口与 sqlite3 游标一致
+class PostgresCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self._record = None
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def execute(self, sql, parameters=()):
+        self._record, started = query_trace.begin_query(sql)
+        try:
+            for statement in translate(sql):
+                self._cursor.execute(statement, parameters)
+            return self
+        finally:
+            query_trace.end_query(self._record, started, max(self._cursor.rowcount, 0))
+
+    def executemany(self, sql, seq_of_parameters):
+        self._record, started = query_trace.begin_query(sql)
+        try:
+            statement, = translate(sql)
+            self._cursor.executemany(statement, seq_of_parameters)
+            return self
+        finally:
+            query_trace.end_query(self._record, started, max(self._cursor.rowcount, 0))
+
+    def _fetch(self, fetch, *args):
+        started = time.perf_counter() if self._record is not None else None
+        rows = fetch(*args)
+        query_trace.end_query(self._record, started, len(rows) if isinstance(rows, list) else int(rows is not None))
+        return rows
+
+    def fetchone(self):
+        return self._fetch(self._cursor.fetchone)
+
+    def fetchmany(self, size=None):
+        return self._fetch(self._cursor.fetchmany, size or self._cursor.arraysize)
+
+    def fetchall(self):
+        return self._fetch(self._cursor.fetchall)
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def close(self):
+        self._cursor.close()
+
+# PostgreSQL 连接：提供业务代码使用的 sqlite3 连接接口
+class PostgresConnection:
+    def __init__(self, conn):
+        self.raw = conn
+
+    @property
+    def in_transaction(self):
+        return self.raw.info.transaction_status != psycopg.pq.TransactionStatus.IDLE
+
+    def cursor(self, name=None):
+        return PostgresCursor(self.raw.cursor(name) if name else self.raw.cursor())
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def commit(self):
+        self.raw.commit()
+
+    def rollback(self):
+        self.raw.rollback()
+
+# PostgreSQL 连接池（psycopg_pool），会话时区固定为 UTC，与 SQLite 的 CURRENT_TIMESTAMP 一致
+class PostgresPool(Pool):
+    dialect = 'postgresql'
+
+    def __init__(self, url, size):
+        if psycopg is None:
+            raise RuntimeError('使用 PostgreSQL 需要安装 psycopg 和 psycopg_pool')
+        from psycopg.types.numeric import FloatLoader
+        from psycopg_pool import ConnectionPool
+
+        # numeric 按 float 读取，与 SQLite 返回的类型一致
+        def configure(conn):
+            conn.adapters.register_loader('numeric', FloatLoader)
+
+        self._pool = ConnectionPool(url, min_size=1, max_size=size, open=True, configure=configure,
+                                    kwargs={'options': '-c timezone=UTC'})
+
+    def acquire(self):
+        return PostgresConnection(self._pool.getconn())
+
+    def release(self, conn):
+        self._pool.putconn(conn.raw)
+
+    # 使用服务端游标逐批读取，结果不会一次性传到客户端
+    def stream(self, sql, params, chunk_size):
+        with self.connection() as conn:
+            cursor = conn.cursor(name='kpi_stream')
+            # 调用方提前停止读取或出错时也要关闭服务端游标，再把连接还回连接池
+            try:
+                cursor.execute(sql, params)
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    yield rows
+            finally:
+                cursor.close()
+
+    def close(self):
+        self._pool.close()
+
+# 按配置创建连接池：url 以 postgresql:// 或 postgres:// 开头时使用 PostgreSQL，否则使用 SQLite 文件
+def create_pool(url, path, size, quick_check_interval=0):
+    if url.startswith(('postgresql://', 'postgres://')):
+        return PostgresPool(url, size)
+    return SQLitePool(path, size, quick_check_interval)
@@ -0,0 +1 @@
+# 性能基准测试：生成合成数据，计时 db.py / template_management.py 的公共函数并渲染管理页面
@@ -0,0 +1,12 @@
+# 供 AppTest 无头渲染的页面脚本，页面由 session_state['bench_page'] 指定
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import streamlit as st
+import user_management
+import template_management
+
+if st.session_state.get('bench_page') == 'template_management':
+    template_management.template_management_page()
+else:
+    user_management.user_management_page()
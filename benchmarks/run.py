@@ -0,0 +1,220 @@
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+# 默认数据规模
+SCALES = {
+    'small': {'users': 1000, 'templates': 100, 'indicators': 3000, 'evaluations': 1000},
+    'medium': {'users': 10000, 'templates': 1000, 'indicators': 100000, 'evaluations': 10000},
+    'large': {'users': 100000, 'templates': 10000, 'indicators': 1000000, 'evaluations': 10000},
+}
+
+PAGE_APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'page_app.py')
+
+# 多次执行函数并记录耗时（毫秒）
+def _measure(name, func, repeat, setup=None):
+    durations = []
+    result = None
+    for _ in range(repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        result = func()
+        durations.append((time.perf_counter() - started) * 1000)
+    try:
+        rows = len(result)
+    except TypeError:
+        rows = None
+    return {
+        'name': name,
+        'repeat': repeat,
+        'min_ms': round(min(durations), 3),
+        'median_ms': round(statistics.median(durations), 3),
+        'mean_ms': round(statistics.fmean(durations), 3),
+        'max_ms': round(max(durations), 3),
+        'rows': rows,
+    }
+
+# 计时 db.py 与 template_management.py 的公共函数
+def bench_functions(repeat):
+    import db
+    import scoring
+    import template_management
+    from benchmarks import synthetic
+
+    template_id = db.get_all_templates(limit=1)[0].template_id
+    page_ids = [template.template_id for template in db.get_all_templates(limit=20)]
+    department = db.get_departments()[0]
+    cases = [
+        ('get_all_users', lambda: db.get_all_users()),
+        ('get_all_users[page]', lambda: db.get_all_users(limit=50)),
+        ('get_all_users[name]', lambda: db.get_all_users('员工0001', limit=50)),
+        ('get_all_users[department,role]', lambda: db.get_all_users('', department, 'user', limit=50)),
+        ('count_users', lambda: [db.count_users()]),
+        ('get_departments[uncached]', lambda: db.get_departments()),
+        ('get_credentials[lookup]', lambda: [db.get_credentials()['usernames']['user000001']]),
+        ('get_user_credentials', lambda: [db.get_user_credentials('user000001')]),
+        ('get_all_templates', lambda: db.get_all_templates()),
+        ('get_all_templates[page]', lambda: db.get_all_templates(limit=20)),
+        ('get_all_templates[week]', lambda: db.get_all_templates('', '最近一周', limit=20)),
+        ('count_templates', lambda: [db.count_templates()]),
+        ('get_template_indicators', lambda: db.get_template_indicators(template_id)),
+        ('get_indicators_for_templates[page]', lambda: db.get_indicators_for_templates(page_ids)),
+        ('get_template_summary', lambda: [db.get_template_summary(template_id)]),
+        ('recompute_scores', lambda: [scoring.recompute(template_id, synthetic.PERIOD)]),
+        ('get_department_rollups', lambda: db.get_department_rollups(synthetic.PERIOD)),
+        ('get_score_buckets', lambda: db.get_score_buckets(synthetic.PERIOD)),
+    ]
+    results = [_measure(name, func, repeat) for name, func in cases]
+
+    # 写操作：在新建的模板和用户上执行，不影响已有数据
+    counter = iter(range(10 ** 9))
+    created = {}
+
+    def create_template():
+        template_management.create_template(f'基准模板{next(counter)}', '基准测试')
+        return []
+
+    def add_indicator():
+        template_management.add_indicator(created['template_id'], next(counter), '业绩指标', '基准指标', '', '', 0.01)
+        return []
+
+    def latest_indicator():
+        with db.get_db_connection() as conn:
+            return conn.execute('SELECT MAX(indicator_id) FROM kpi_indicators WHERE template_id = ?',
+                                (created['template_id'],)).fetchone()[0]
+
+    results.append(_measure('create_template', create_template, repeat))
+    created['template_id'] = max(template.template_id for template in db.get_all_templates('基准模板'))
+    results.append(_measure('update_template', lambda: [template_management.update_template(created['template_id'], '基准模板', '更新')], repeat))
+    results.append(_measure('add_indicator', add_indicator, repeat))
+    results.append(_measure('update_indicator', lambda: [template_management.update_indicator(
+        latest_indicator(), 1, '业绩指标', '基准指标', '', '', 0.02)], repeat))
+    results.append(_measure('delete_indicator', lambda: [template_management.delete_indicator(latest_indicator())], repeat))
+    results.append(_measure('delete_template', lambda: [template_management.delete_template(created['template_id'])], 1))
+
+    usernames = []
+
+    def add_user():
+        username = f'bench{next(counter)}'
+        usernames.append(username)
+        db.add_user(username, '基准用户', 'password', 'user', '基准部门', '', '')
+        return []
+
+    results.append(_measure('add_user', add_user, repeat))
+    results.append(_measure('update_user', lambda: [db.update_user(usernames[0], '基准用户', '基准部门', '', '', 'user')], repeat))
+    results.append(_measure('delete_user', lambda: [db.delete_user(usernames.pop())], min(repeat, len(usernames))))
+    return results
+
+# 使用 AppTest 无头渲染管理页面并计时
+def bench_pages(repeat):
+    from streamlit.testing.v1 import AppTest
+
+    results = []
+    for page in ('user_management', 'template_management'):
+        def render():
+            at = AppTest.from_file(PAGE_APP, default_timeout=600)
+            at.session_state['bench_page'] = page
+            at.run()
+            if at.exception:
+                raise RuntimeError(at.exception[0].value)
+            return at.main.children
+        results.append(_measure(f'page:{page}', render, repeat))
+    return results
+
+# 当前代码版本
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(PAGE_APP)).stdout.strip() or None
+    except OSError:
+        return None
+
+# 对比两次运行结果（按中位数）
+def compare(before_path, after_path):
+    with open(before_path, encoding='utf-8') as f:
+        before = {result['name']: result for result in json.load(f)['results']}
+    with open(after_path, encoding='utf-8') as f:
+        after = json.load(f)['results']
+    print(f"{'名称':<40}{'之前(ms)':>12}{'之后(ms)':>12}{'比例':>10}")
+    for result in after:
+        old = before.get(result['name'])
+        if old is None:
+            print(f"{result['name']:<40}{'-':>12}{result['median_ms']:>12.3f}{'-':>10}")
+            continue
+        ratio = result['median_ms'] / old['median_ms'] if old['median_ms'] else float('inf')
+        print(f"{result['name']:<40}{old['median_ms']:>12.3f}{result['median_ms']:>12.3f}{ratio:>9.2f}x")
+
+def main():
+    parser = argparse.ArgumentParser(description='KPI考核系统性能基准测试')
+    parser.add_argument('--db', default='bench.db', help='临时数据库文件路径（会被覆盖）')
+    parser.add_argument('--scale', choices=SCALES, default='large', help='数据规模')
+    parser.add_argument('--users', type=int, help='用户数')
+    parser.add_argument('--templates', type=int, help='模板数')
+    parser.add_argument('--indicators', type=int, help='指标数')
+    parser.add_argument('--evaluations', type=int, help='参评员工数（按第一个模板评分）')
+    parser.add_argument('--repeat', type=int, default=5, help='每个函数的执行次数')
+    parser.add_argument('--reuse', action='store_true', help='复用已有的数据库，不重新生成数据')
+    parser.add_argument('--skip-pages', action='store_true', help='不渲染页面')
+    parser.add_argument('--output', default='bench_results.json', help='结果文件路径（JSON）')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help='对比两个结果文件')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    sizes = dict(SCALES[args.scale])
+    for key in sizes:
+        if getattr(args, key) is not None:
+            sizes[key] = getattr(args, key)
+
+    # 必须在导入 db 之前设置，页面脚本也会读取同一个数据库
+    os.environ['KPI_DB_PATH'] = os.path.abspath(args.db)
+    # 关闭进程级读缓存，每次重复都计时实际的查询，结果可以与没有缓存的版本对比
+    os.environ['KPI_READ_CACHE_SIZE'] = '0'
+    sys.path.insert(0, os.path.dirname(os.path.dirname(PAGE_APP)))
+    import repository
+    from benchmarks import synthetic
+    repository.DB_PATH = os.environ['KPI_DB_PATH']
+
+    if not args.reuse:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(repository.DB_PATH + suffix):
+                os.remove(repository.DB_PATH + suffix)
+        started = time.perf_counter()
+        synthetic.generate(repository.DB_PATH, **sizes)
+        print(f'生成数据: {time.perf_counter() - started:.1f} 秒 {sizes}')
+
+    results = bench_functions(args.repeat)
+    if not args.skip_pages:
+        results += bench_pages(args.repeat)
+
+    output = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'revision': _git_revision(),
+            'sizes': sizes,
+            'repeat': args.repeat,
+            'read_cache': False,
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+        },
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(output, f, ensure_ascii=False, indent=2)
+
+    for result in results:
+        print(f"{result['name']:<40}{result['median_ms']:>12.3f} ms")
+    print(f'结果已写入 {args.output}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+import random
+import sqlite3
+import migrations
+import passwords
+
+# 合成数据使用的部门、分类和文本片段
+DEPARTMENTS = ['销售部', '市场部', '研发部', '财务部', '人事部', '客服部', '生产部', '采购部', '法务部', '行政部']
+CATEGORIES = ['业绩指标', '能力指标', '态度指标', '管理指标']
+PHRASES = ['客户满意度', '销售额完成率', '项目按期交付率', '成本控制', '团队协作', '培训完成率', '投诉处理及时率', '回款率']
+
+# 合成评分使用的考核周期
+PERIOD = '2026-01'
+
+# 每批写入的行数
+BATCH_SIZE = 50000
+
+# 分批生成数据，避免一次性占用大量内存
+def _batches(total, make_row):
+    batch = []
+    for i in range(total):
+        batch.append(make_row(i))
+        if len(batch) >= BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+# 在 repository.DB_PATH 指向的数据库中执行迁移并写入合成数据
+def generate(path, users, templates, indicators, evaluations=0, seed=0):
+    rng = random.Random(seed)
+    migrations.migrate()
+
+    # 所有合成用户共用一个密码哈希（密码为 password），避免生成数据时计算大量 bcrypt
+    hashed_password = passwords.hash_password('password')
+    conn = sqlite3.connect(path)
+    try:
+        for batch in _batches(users, lambda i: (
+                f'user{i:06d}', f'员工{i:06d}', hashed_password, 'admin' if i % 100 == 0 else 'user',
+                rng.choice(DEPARTMENTS), '专员', f'E{i:06d}')):
+            conn.executemany('INSERT OR IGNORE INTO users (username, name, password, role, department, position, employee_id) '
+                             'VALUES (?, ?, ?, ?, ?, ?, ?)', batch)
+
+        first_template = conn.execute('SELECT COALESCE(MAX(template_id), 0) FROM kpi_templates').fetchone()[0] + 1
+        for batch in _batches(templates, lambda i: (
+                f'{rng.choice(DEPARTMENTS)}考核模板{i:05d}', f'合成模板 {i}',
+                f'-{rng.randint(0, 365)} days')):
+            conn.executemany("INSERT INTO kpi_templates (template_name, description, created_at) "
+                             "VALUES (?, ?, datetime('now', ?))", batch)
+
+        # 指标平均分配到各模板，每个模板的权重总和为100%
+        per_template = max(1, indicators // max(1, templates))
+        weight = round(100 / per_template, 2)
+        for batch in _batches(min(indicators, per_template * templates), lambda i: (
+                first_template + i // per_template, i % per_template + 1, rng.choice(CATEGORIES),
+                f'{rng.choice(PHRASES)}{i}', f'{rng.choice(PHRASES)}的说明', f'{rng.choice(PHRASES)}达到目标得满分',
+                weight)):
+            conn.executemany('INSERT INTO kpi_indicators (template_id, sequence_number, category, name, description, '
+                             'evaluation_criteria, weight) VALUES (?, ?, ?, ?, ?, ?, ?)', batch)
+
+        # 前 evaluations 名员工按第一个模板在 PERIOD 周期内评分，每个指标都有得分
+        # 只有已发布的版本才能评分，第一个模板在写入指标之后发布
+        evaluated = min(evaluations, users)
+        indicator_ids = [row[0] for row in conn.execute(
+            'SELECT indicator_id FROM kpi_indicators WHERE template_id = ?', (first_template,))]
+        if indicator_ids and evaluated:
+            conn.execute('UPDATE kpi_templates SET published_at = CURRENT_TIMESTAMP WHERE template_id = ?',
+                         (first_template,))
+            conn.executemany('INSERT OR IGNORE INTO kpi_evaluations (username, period, template_id) VALUES (?, ?, ?)',
+                             ((f'user{i:06d}', PERIOD, first_template) for i in range(evaluated)))
+            for batch in _batches(evaluated * len(indicator_ids), lambda i: (
+                    PERIOD, indicator_ids[i % len(indicator_ids)], f'user{i // len(indicator_ids):06d}',
+                    rng.randint(60, 100))):
+                conn.executemany('INSERT OR IGNORE INTO kpi_scores (period, indicator_id, username, score) '
+                                 'VALUES (?, ?, ?, ?)', batch)
+        conn.commit()
+        conn.execute('ANALYZE')
+    finally:
+        conn.close()
@@ -1,125 +1,58 @@
-import sqlite3
-import pandas as pd
+from collections.abc import Mapping
 import streamlit as st
-import streamlit_authenticator as stauth
+import passwords
+import repository
+import scoring
 
-# 数据库连接函数
-def get_db_connection():
+# 页面使用的数据接口：查询委托给 repository，写操作出错时通过 st.error 提示并返回 False
+
+# 获取进程级连接池（跨会话、跨重跑共享），首次创建失败时在页面上提示
+def get_connection_pool():
     try:
-        conn = sqlite3.connect('kpi.db', timeout=30)
-        conn.execute('PRAGMA journal_mode=WAL;')  # 使用预写日志模式
-        
-        # 执行完整性检查
-        integrity_check = conn.execute('PRAGMA integrity_check;').fetchone()[0]
-        if integrity_check != 'ok':
-            raise sqlite3.DatabaseError(f'数据库完整性检查失败: {integrity_check}')
-        
-        return conn
-    except sqlite3.Error as e:
+        return repository.get_pool()
+    except repository.DATABASE_ERRORS as e:
         st.error(f'数据库连接错误: {str(e)}')
         st.error('建议操作: 1. 恢复备份数据库 2. 删除当前数据库重新初始化')
         raise
 
-# 初始化数据库
-def init_db():
-    try:
-        conn = get_db_connection()
-        c = conn.cursor()
-        
-        # 创建用户表
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                username TEXT PRIMARY KEY,
-                name TEXT,
-                password TEXT,
-                role TEXT,
-                department TEXT,
-                position TEXT,
-                employee_id TEXT
-            )
-        ''')
-        
-        # 创建考核模板表
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS kpi_templates (
-                template_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                template_name TEXT NOT NULL,
-                description TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # 创建考核指标表
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS kpi_indicators (
-                indicator_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                template_id INTEGER,
-                sequence_number INTEGER,
-                category TEXT,
-                name TEXT NOT NULL,
-                description TEXT,
-                evaluation_criteria TEXT,
-                weight DECIMAL(5,2),
-                FOREIGN KEY (template_id) REFERENCES kpi_templates (template_id)
-            )
-        ''')
-        
-        # 检查默认用户
-        c.execute('SELECT * FROM users WHERE username = ?', ('admin',))
-        if not c.fetchone():
-            hashed_password = stauth.Hasher(['admin']).generate()[0]
-            c.execute('''
-                INSERT INTO users 
-                (username, name, password, role, department, position, employee_id)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', ('admin', 'Administrator', hashed_password, 'admin', '管理部', '系统管理员', 'ADMIN001'))
-        
-        conn.commit()
-    
-    except sqlite3.Error as e:
-        st.error(f'数据库错误: {str(e)}')
-        st.error('建议操作: 1. 恢复备份数据库 2. 删除当前数据库重新初始化')
-        raise
-    finally:
-        if 'conn' in locals():
-            conn.close()
-
-# 获取所有用户
-def get_all_users(search_name="", filter_department="全部", filter_role="全部"):
-    conn = get_db_connection()
-    users_df = pd.read_sql_query('SELECT username, name, role, department, position, employee_id FROM users', conn)
-    conn.close()
-    
-    # 应用筛选条件
-    if search_name:
-        users_df = users_df[users_df['name'].str.contains(search_name, na=False)]
-    if filter_department != '全部':
-        users_df = users_df[users_df['department'] == filter_department]
-    if filter_role != '全部':
-        users_df = users_df[users_df['role'] == filter_role]
-    
-    return users_df
+# 数据库连接函数：从连接池借出连接，正常退出时提交，异常时回滚
+def get_db_connection():
+    return get_connection_pool().connection()
+
+# 写线程的队列深度、提交次数和排队等待时间
+def get_write_stats():
+    return repository.get_writer().stats()
+
+# 进程级读缓存的命中率和缓存的结果数
+def get_read_cache_stats():
+    return repository.read_cache_stats()
+
+# 页面筛选框中的“全部”表示不筛选
+def _filter_value(value):
+    return None if value == '全部' else value
+
+# 获取所有用户（筛选条件在 SQL 中执行，limit 为 None 时不分页）
+def get_all_users(search_name="", filter_department="全部", filter_role="全部", limit=None, offset=0):
+    return repository.list_users(search_name, _filter_value(filter_department), _filter_value(filter_role), limit, offset)
+
+# 统计符合筛选条件的用户数
+def count_users(search_name="", filter_department="全部", filter_role="全部"):
+    return repository.count_users(search_name, _filter_value(filter_department), _filter_value(filter_role))
+
+# 获取所有部门（部门表由触发器维护，结果在进程级读缓存中，本进程和其他进程写入用户后都会失效）
+def get_departments():
+    return repository.list_departments()
 
 # 添加新用户
 def add_user(username, name, password, role, department, position, employee_id):
     try:
-        conn = get_db_connection()
-        c = conn.cursor()
-        
-        # 检查用户名是否已存在
-        c.execute('SELECT username FROM users WHERE username = ?', (username,))
-        if c.fetchone() is not None:
-            st.error('用户名已存在')
-            conn.close()
-            return False
-        
-        # 添加新用户
-        hashed_password = stauth.Hasher([password]).generate()[0]
-        c.execute('INSERT INTO users (username, name, password, role, department, position, employee_id) VALUES (?, ?, ?, ?, ?, ?, ?)',
-                (username, name, hashed_password, role, department, position, employee_id))
-        conn.commit()
-        conn.close()
+        # 添加新用户，密码哈希在后台计算完成后写入（此前该用户无法登录）
+        repository.insert_user(username, name, role, department, position, employee_id)
+        set_password_async(username, password)
         return True
+    except repository.DuplicateUserError:
+        st.error('用户名已存在')
+        return False
     except Exception as e:
         st.error(f'添加用户失败: {str(e)}')
         return False
@@ -127,95 +60,136 @@ def add_user(username, name, password, role, department, position, employee_id):
 # 更新用户信息
 def update_user(username, name, department, position, employee_id, role, password=None):
     try:
-        conn = get_db_connection()
-        c = conn.cursor()
-        
+        repository.update_user(username, name, department, position, employee_id, role)
+
+        # 新密码在后台计算哈希，完成前旧密码仍然有效
         if password and password.strip():
-            # 更新包括密码
-            hashed_password = stauth.Hasher([password]).generate()[0]
-            c.execute('''
-                UPDATE users 
-                SET name = ?, department = ?, position = ?, employee_id = ?, role = ?, password = ? 
-                WHERE username = ?
-            ''', (name, department, position, employee_id, role, hashed_password, username))
-        else:
-            # 不更新密码
-            c.execute('''
-                UPDATE users 
-                SET name = ?, department = ?, position = ?, employee_id = ?, role = ? 
-                WHERE username = ?
-            ''', (name, department, position, employee_id, role, username))
-        
-        conn.commit()
-        conn.close()
+            set_password_async(username, password)
         return True
     except Exception as e:
         st.error(f'更新用户失败: {str(e)}')
         return False
 
+# 在后台计算密码哈希并写入；expected_hash 不为空时只在密码未被修改的情况下写入
+# track 为 False 时页面不查询任务状态（例如登录时按新的计算强度重新哈希）
+def set_password_async(username, password, expected_hash=None, track=True):
+    return passwords.submit_hash(
+        username, password,
+        lambda hashed_password, is_current: repository.set_password_hash(username, hashed_password, expected_hash,
+                                                                         is_current),
+        track
+    )
+
 # 删除用户
 def delete_user(username):
     try:
-        conn = get_db_connection()
-        c = conn.cursor()
-        c.execute('DELETE FROM users WHERE username = ?', (username,))
-        conn.commit()
-        conn.close()
+        repository.delete_user(username)
         return True
     except Exception as e:
         st.error(f'删除用户失败: {str(e)}')
         return False
 
+# 按用户名查询单个用户的凭证，返回 Credentials 记录或 None
+def get_user_credentials(username):
+    return repository.get_credentials(username)
+
+# 按需查询的用户凭证映射，只在认证器访问某个用户名时才查询数据库
+class CredentialProvider(Mapping):
+    def __init__(self):
+        self._cache = {}
+
+    def __getitem__(self, username):
+        if username not in self._cache:
+            credentials = get_user_credentials(username)
+            # 密码哈希仍在后台计算的用户暂时不能登录
+            if credentials is None or credentials.password is None:
+                self._cache[username] = None
+            else:
+                # account 为数据库中存储的用户名（登录时用户名不区分大小写）
+                self._cache[username] = {'name': credentials.name, 'password': credentials.password, 'role': credentials.role,
+                                         'account': credentials.username}
+        if self._cache[username] is None:
+            raise KeyError(username)
+        return self._cache[username]
+
+    def __iter__(self):
+        return iter(repository.list_login_usernames())
+
+    def __len__(self):
+        return repository.count_login_users()
+
 # 获取用户凭证
 def get_credentials():
-    conn = get_db_connection()
-    users_df = pd.read_sql_query('SELECT * FROM users', conn)
-    conn.close()
-    
-    credentials = {
-        'usernames': {}
+    return {
+        'usernames': CredentialProvider()
     }
-    
-    for _, row in users_df.iterrows():
-        credentials['usernames'][row['username']] = {
-            'name': row['name'],
-            'password': row['password'],
-            'role': row['role']
-        }
-    
-    return credentials
-
-# 获取所有模板
-def get_all_templates(search_name="", filter_date="全部"):
-    conn = get_db_connection()
-    templates_df = pd.read_sql_query('SELECT * FROM kpi_templates', conn)
-    conn.close()
-    
-    # 应用筛选条件
-    if search_name:
-        templates_df = templates_df[templates_df['template_name'].str.contains(search_name, na=False)]
-    
-    # 按创建时间筛选
-    if filter_date != '全部':
-        if filter_date == '最近一周':
-            one_week_ago = pd.Timestamp.now() - pd.Timedelta(days=7)
-            templates_df = templates_df[pd.to_datetime(templates_df['created_at']) >= one_week_ago]
-        elif filter_date == '最近一个月':
-            one_month_ago = pd.Timestamp.now() - pd.Timedelta(days=30)
-            templates_df = templates_df[pd.to_datetime(templates_df['created_at']) >= one_month_ago]
-        elif filter_date == '最近三个月':
-            three_months_ago = pd.Timestamp.now() - pd.Timedelta(days=90)
-            templates_df = templates_df[pd.to_datetime(templates_df['created_at']) >= three_months_ago]
-    
-    return templates_df
+
+# 按创建时间筛选的预设范围（天数）
+TEMPLATE_DATE_FILTERS = repository.TEMPLATE_DATE_FILTERS
+
+# 获取所有模板及其汇总信息（筛选条件在 SQL 中执行，limit 为 None 时不分页）
+def get_all_templates(search_name="", filter_date="全部", start_date=None, end_date=None, limit=None, offset=0,
+                      published_only=False):
+    return repository.list_templates(search_name, TEMPLATE_DATE_FILTERS.get(filter_date), start_date, end_date, limit, offset,
+                                     published_only)
+
+# 统计符合筛选条件的模板数
+def count_templates(search_name="", filter_date="全部", start_date=None, end_date=None):
+    return repository.count_templates(search_name, TEMPLATE_DATE_FILTERS.get(filter_date), start_date, end_date)
 
 # 获取模板的指标
 def get_template_indicators(template_id):
-    conn = get_db_connection()
-    indicators_df = pd.read_sql_query(
-        'SELECT * FROM kpi_indicators WHERE template_id = ? ORDER BY sequence_number',
-        conn,
-        params=(template_id,)
-    )
-    conn.close()
-    return indicators_df
\ No newline at end of file
+    return repository.list_indicators(template_id)
+
+# 批量获取多个模板的指标，返回 {template_id: (Indicator, ...)}
+def get_indicators_for_templates(template_ids):
+    return repository.list_indicators_for_templates(template_ids)
+
+# 获取模板的汇总信息（指标数、权重总和、最大序号）
+def get_template_summary(template_id):
+    return repository.get_template_summary(template_id)
+
+# 在所有模板（最新版本）的指标中搜索，返回按相关度排序的 IndicatorHit 列表
+def search_indicators(query, limit=50):
+    return repository.search_indicators(query.strip(), limit)
+
+# 在所有模板（最新版本）的名称和说明中搜索，返回 TemplateHit 列表
+def search_templates(query, limit=20):
+    return repository.search_templates(query.strip(), limit)
+
+# 获取员工各考核周期的考核结果
+def get_evaluations(username):
+    return repository.list_evaluations(username)
+
+# 获取员工在某个考核周期的考核结果，不存在时返回 None
+def get_evaluation(username, period):
+    return repository.get_evaluation(username, period)
+
+# 获取员工在某个考核周期的各项得分 {indicator_id: score}
+def get_scores(username, period):
+    return repository.list_scores(username, period)
+
+# 保存得分并重新计算该员工的加权总分
+def save_scores(username, period, template_id, scores):
+    try:
+        repository.save_scores(username, period, template_id, scores)
+        scoring.recompute(template_id, period, username)
+        return True
+    except repository.TemplateNotPublishedError:
+        st.error('该模板版本尚未发布，不能用于考核')
+        return False
+    except Exception as e:
+        st.error(f'保存评分失败: {str(e)}')
+        return False
+
+# 获取有部门考核汇总的周期
+def get_rollup_periods():
+    return repository.list_rollup_periods()
+
+# 获取某个周期的部门排名
+def get_department_rollups(period):
+    return repository.list_department_rollups(period)
+
+# 获取某个周期的部门分数段分布
+def get_score_buckets(period):
+    return repository.list_score_buckets(period)
@@ -0,0 +1,44 @@
+import streamlit as st
+import db
+
+# 部门排名表格的列标题
+ROLLUP_COLUMNS = {
+    'rank': '排名',
+    'department': '部门',
+    'average_score': '平均分',
+    'evaluated_count': '参评人数',
+    'user_count': '部门人数',
+}
+
+# 部门考核统计页面（数据来自触发器维护的汇总表）
+def department_dashboard_page():
+    st.title('部门考核统计')
+
+    periods = db.get_rollup_periods()
+    if not periods:
+        st.info('暂无考核结果')
+        return
+    period = st.selectbox('考核周期', periods, key='dashboard_period')
+
+    rollups = db.get_department_rollups(period)
+    evaluated = sum(rollup.evaluated_count for rollup in rollups)
+    average = sum(rollup.average_score * rollup.evaluated_count for rollup in rollups) / evaluated if evaluated else 0
+    cols = st.columns(3)
+    cols[0].metric('参评部门', len(rollups))
+    cols[1].metric('参评人数', evaluated)
+    cols[2].metric('全员平均分', f'{average:.2f}')
+
+    st.subheader('部门排名')
+    st.dataframe(
+        [rollup._asdict() for rollup in rollups],
+        hide_index=True,
+        column_order=list(ROLLUP_COLUMNS),
+        column_config=ROLLUP_COLUMNS,
+    )
+
+    st.subheader('分数段分布')
+    buckets = [
+        {'分数段': f'{bucket.bucket * 10}-{bucket.bucket * 10 + 10}', '部门': bucket.department, '人数': bucket.employee_count}
+        for bucket in db.get_score_buckets(period)
+    ]
+    st.bar_chart(buckets, x='分数段', y='人数', color='部门')
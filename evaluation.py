@@ -0,0 +1,85 @@
+from datetime import date
+import streamlit as st
+import db
+
+# 选择模板时最多列出的模板数
+TEMPLATE_CHOICES_LIMIT = 50
+
+# 考核结果表格的列标题
+EVALUATION_COLUMNS = {
+    'period': '考核周期',
+    'template_name': '考核模板',
+    'total_score': '加权总分',
+    'scored_count': '已评指标数',
+    'indicator_count': '指标总数',
+    'computed_at': '计算时间',
+}
+
+# 填写得分的表单，提交时一次写入并重新计算总分
+def _score_form(username, period, evaluation):
+    # 本周期已选定模板时沿用，否则从模板列表中选择
+    if evaluation is not None:
+        template_id = evaluation.template_id
+        st.subheader(f'考核模板: {evaluation.template_name}')
+    else:
+        search_name = st.text_input('按模板名称搜索', key='evaluation_template_search')
+        # 只能选择已发布的模板（每个模板的最新发布版本）
+        templates = db.get_all_templates(search_name, limit=TEMPLATE_CHOICES_LIMIT, published_only=True)
+        if not templates:
+            st.info('暂无已发布的考核模板')
+            return
+        names = {template.template_id: f'{template.template_name}（v{template.version}）' for template in templates}
+        template_id = st.selectbox('选择考核模板', list(names), format_func=names.get, key='evaluation_template')
+
+    indicators = db.get_template_indicators(template_id)
+    if not indicators:
+        st.info('该模板暂无考核指标')
+        return
+
+    scores = db.get_scores(username, period)
+    with st.form('evaluation_form'):
+        new_scores = {}
+        for indicator in indicators:
+            st.write(f"{indicator.sequence_number}. {indicator.name}（{indicator.category}，权重 {indicator.weight}%）")
+            if indicator.evaluation_criteria:
+                st.caption(f"评价标准: {indicator.evaluation_criteria}")
+            new_scores[indicator.indicator_id] = st.number_input(
+                '得分', min_value=0.0, max_value=100.0, value=float(scores.get(indicator.indicator_id, 0.0)),
+                key=f"score_{period}_{indicator.indicator_id}"
+            )
+        if st.form_submit_button('保存评分'):
+            if db.save_scores(username, period, template_id, new_scores):
+                st.success('评分保存成功')
+                st.rerun()
+
+# 普通用户的考核页面：按考核周期填写各项指标得分，查看加权总分
+def evaluation_page(username):
+    st.title('我的考核')
+    period = st.text_input('考核周期', value=date.today().strftime('%Y-%m'), key='evaluation_period').strip()
+    evaluation = db.get_evaluation(username, period) if period else None
+
+    # 创建两列布局
+    col1, col2 = st.columns([2, 1])
+
+    with col1:
+        if period:
+            _score_form(username, period, evaluation)
+        else:
+            st.warning('请填写考核周期')
+
+    with col2:
+        st.subheader('考核结果')
+        if evaluation is not None and evaluation.total_score is not None:
+            st.metric(f'{period} 加权总分', f'{evaluation.total_score:g}')
+            st.caption(f'已评 {evaluation.scored_count} / {evaluation.indicator_count} 项指标')
+
+        evaluations = db.get_evaluations(username)
+        if evaluations:
+            st.dataframe(
+                [row._asdict() for row in evaluations],
+                hide_index=True,
+                column_order=list(EVALUATION_COLUMNS),
+                column_config=EVALUATION_COLUMNS,
+            )
+        else:
+            st.info('暂无考核记录')
@@ -0,0 +1,132 @@
+import argparse
+import csv
+import io
+import os
+import tempfile
+import streamlit as st
+import repository
+
+# 每批从数据库读取并写入文件的行数
+EXPORT_CHUNK_SIZE = 5000
+# Excel 工作表的最大行数（含表头）
+XLSX_MAX_ROWS = 1048576
+
+# 导出内容：表头（与导入文件一致，可直接重新导入）、Parquet 列类型、按批读取数据的函数
+EXPORTS = {
+    'templates': {
+        'label': '考核模板及指标',
+        'header': ['模板名称', '模板描述', '序号', '指标分类', '指标名称', '指标解释', '评价标准', '指标权重(%)'],
+        'types': ['string', 'string', 'int64', 'string', 'string', 'string', 'string', 'float64'],
+        'rows': repository.iter_template_export,
+    },
+    'users': {
+        'label': '用户（不含密码）',
+        'header': ['用户名', '姓名', '角色', '部门', '岗位', '工号'],
+        'types': ['string'] * 6,
+        'rows': repository.iter_user_export,
+    },
+}
+
+# 导出格式：显示名称、MIME 类型
+FORMATS = {
+    'csv': ('CSV', 'text/csv'),
+    'xlsx': ('Excel', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'parquet': ('Parquet', 'application/vnd.apache.parquet'),
+}
+
+# 逐批写入 CSV（带 BOM，Excel 可直接打开）
+def _write_csv(chunks, header, types, file):
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    writer = csv.writer(text)
+    writer.writerow(header)
+    for rows in chunks:
+        writer.writerows(rows)
+    text.flush()
+    text.detach()
+
+# 逐批写入 Excel（只写模式，行直接写入临时文件，不在内存中保留整个工作表；超过行数上限时写入下一个工作表）
+def _write_xlsx(chunks, header, types, file):
+    from openpyxl import Workbook
+    workbook = Workbook(write_only=True)
+    sheet = None
+    for rows in chunks:
+        for row in rows:
+            if sheet is None or sheet_rows >= XLSX_MAX_ROWS:
+                sheet = workbook.create_sheet()
+                sheet.append(header)
+                sheet_rows = 1
+            sheet.append(row)
+            sheet_rows += 1
+    if sheet is None:
+        workbook.create_sheet().append(header)
+    workbook.save(file)
+
+# 逐批写入 Parquet（每批一个行组）
+def _write_parquet(chunks, header, types, file):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    schema = pa.schema([(name, getattr(pa, type_name)()) for name, type_name in zip(header, types)])
+    with pq.ParquetWriter(file, schema) as writer:
+        for rows in chunks:
+            columns = [pa.array(values, type=field.type) for values, field in zip(zip(*rows), schema)]
+            writer.write_batch(pa.RecordBatch.from_arrays(columns, schema=schema))
+
+WRITERS = {
+    'csv': _write_csv,
+    'xlsx': _write_xlsx,
+    'parquet': _write_parquet,
+}
+
+# 把指定内容按指定格式写入二进制文件对象，返回导出的行数
+def export(kind, fmt, file, chunk_size=EXPORT_CHUNK_SIZE):
+    spec = EXPORTS[kind]
+    count = 0
+
+    def chunks():
+        nonlocal count
+        for rows in spec['rows'](chunk_size):
+            count += len(rows)
+            yield rows
+
+    WRITERS[fmt](chunks(), spec['header'], spec['types'], file)
+    return count
+
+# 导出到临时文件（下载按钮点击时在后台线程中执行），返回定位到开头的文件对象
+def _export_to_temp_file(kind, fmt):
+    file = tempfile.TemporaryFile()
+    export(kind, fmt, file)
+    file.seek(0)
+    return file
+
+# 导出页面区块
+def export_section(kind):
+    spec = EXPORTS[kind]
+    with st.expander(f"导出{spec['label']}"):
+        fmt = st.radio('文件格式', list(FORMATS), format_func=lambda fmt: FORMATS[fmt][0],
+                       horizontal=True, key=f'export_format_{kind}')
+        st.download_button(
+            '下载',
+            data=lambda: _export_to_temp_file(kind, fmt),
+            file_name=f'{kind}.{fmt}',
+            mime=FORMATS[fmt][1],
+            key=f'export_download_{kind}',
+        )
+
+# 命令行入口：导出到文件，格式由扩展名决定
+def main():
+    parser = argparse.ArgumentParser(description='导出考核模板或用户')
+    parser.add_argument('kind', choices=EXPORTS, help='导出内容')
+    parser.add_argument('file', help='输出文件（.csv / .xlsx / .parquet）')
+    parser.add_argument('--db', default=repository.DB_PATH, help='数据库文件路径')
+    args = parser.parse_args()
+
+    fmt = os.path.splitext(args.file)[1].lstrip('.').lower()
+    if fmt not in WRITERS:
+        parser.error(f"不支持的文件格式: {fmt}，可选 {', '.join(WRITERS)}")
+    repository.DB_PATH = args.db
+    with open(args.file, 'wb') as file:
+        count = export(args.kind, fmt, file)
+    print(f'已导出 {count} 行到 {args.file}')
+
+if __name__ == '__main__':
+    main()
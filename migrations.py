@@ -0,0 +1,505 @@
+import argparse
+import streamlit as st
+import streamlit_authenticator as stauth
+import db
+import repository
+import rollups
+
+# 迁移步骤：每一步接收一个游标，在同一个事务中与版本记录一起提交
+
+# 1. 创建基础表
+def _create_base_tables(c):
+    # 创建用户表
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            username TEXT PRIMARY KEY,
+            name TEXT,
+            password TEXT,
+            role TEXT,
+            department TEXT,
+            position TEXT,
+            employee_id TEXT
+        )
+    ''')
+
+    # 创建考核模板表
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS kpi_templates (
+            template_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            template_name TEXT NOT NULL,
+            description TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # 创建考核指标表
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS kpi_indicators (
+            indicator_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            template_id INTEGER,
+            sequence_number INTEGER,
+            category TEXT,
+            name TEXT NOT NULL,
+            description TEXT,
+            evaluation_criteria TEXT,
+            weight DECIMAL(5,2),
+            FOREIGN KEY (template_id) REFERENCES kpi_templates (template_id)
+        )
+    ''')
+
+# 2. 创建默认管理员
+def _create_default_admin(c):
+    c.execute('SELECT 1 FROM users WHERE username = ?', ('admin',))
+    if not c.fetchone():
+        hashed_password = stauth.Hasher(['admin']).generate()[0]
+        c.execute('''
+            INSERT INTO users
+            (username, name, password, role, department, position, employee_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', ('admin', 'Administrator', hashed_password, 'admin', '管理部', '系统管理员', 'ADMIN001'))
+
+# 3. 指标按模板查询、按序号排序的索引
+def _create_indicator_indexes(c):
+    c.execute('CREATE INDEX IF NOT EXISTS idx_kpi_indicators_template ON kpi_indicators (template_id, sequence_number)')
+
+# 4. 登录时按小写用户名查询的表达式索引
+def _create_username_lower_index(c):
+    c.execute('CREATE INDEX IF NOT EXISTS idx_users_username_lower ON users (lower(username))')
+
+# 5. 用户按部门、角色筛选并按用户名分页的索引
+def _create_user_filter_indexes(c):
+    c.execute('CREATE INDEX IF NOT EXISTS idx_users_department ON users (department, username)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_users_role ON users (role, username)')
+
+# 6. 部门维度表，由触发器随用户增删改维护
+def _create_departments(c):
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS departments (
+            department TEXT PRIMARY KEY,
+            user_count INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    c.execute('''
+        INSERT OR REPLACE INTO departments (department, user_count)
+        SELECT department, COUNT(*) FROM users WHERE department IS NOT NULL GROUP BY department
+    ''')
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_users_department_insert
+        AFTER INSERT ON users WHEN NEW.department IS NOT NULL
+        BEGIN
+            INSERT INTO departments (department, user_count) VALUES (NEW.department, 1)
+            ON CONFLICT (department) DO UPDATE SET user_count = user_count + 1;
+        END
+    ''')
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_users_department_delete
+        AFTER DELETE ON users WHEN OLD.department IS NOT NULL
+        BEGIN
+            UPDATE departments SET user_count = user_count - 1 WHERE department = OLD.department;
+            DELETE FROM departments WHERE department = OLD.department AND user_count <= 0;
+        END
+    ''')
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_users_department_update
+        AFTER UPDATE OF department ON users WHEN OLD.department IS NOT NEW.department
+        BEGIN
+            UPDATE departments SET user_count = user_count - 1 WHERE department = OLD.department;
+            DELETE FROM departments WHERE department = OLD.department AND user_count <= 0;
+            INSERT INTO departments (department, user_count)
+            SELECT NEW.department, 1 WHERE NEW.department IS NOT NULL
+            ON CONFLICT (department) DO UPDATE SET user_count = user_count + 1;
+        END
+    ''')
+
+# 7. 模板按创建时间筛选的索引
+def _create_template_created_at_index(c):
+    c.execute('CREATE INDEX IF NOT EXISTS idx_kpi_templates_created_at ON kpi_templates (created_at)')
+
+# 8. 模板汇总表（指标数、权重总和、最大序号），由触发器随指标增删改维护
+def _create_template_summary(c):
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS kpi_template_summary (
+            template_id INTEGER PRIMARY KEY,
+            indicator_count INTEGER NOT NULL DEFAULT 0,
+            weight_sum REAL NOT NULL DEFAULT 0,
+            max_sequence INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    c.execute('''
+        INSERT OR REPLACE INTO kpi_template_summary (template_id, indicator_count, weight_sum, max_sequence)
+        SELECT template_id, COUNT(*), ROUND(COALESCE(SUM(weight), 0), 2), COALESCE(MAX(sequence_number), 0)
+        FROM kpi_indicators WHERE template_id IS NOT NULL GROUP BY template_id
+    ''')
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_kpi_indicators_summary_insert
+        AFTER INSERT ON kpi_indicators
+        BEGIN
+            INSERT INTO kpi_template_summary (template_id, indicator_count, weight_sum, max_sequence)
+            VALUES (NEW.template_id, 1, ROUND(COALESCE(NEW.weight, 0), 2), COALESCE(NEW.sequence_number, 0))
+            ON CONFLICT (template_id) DO UPDATE SET
+                indicator_count = indicator_count + 1,
+                weight_sum = ROUND(weight_sum + COALESCE(NEW.weight, 0), 2),
+                max_sequence = MAX(max_sequence, COALESCE(NEW.sequence_number, 0));
+        END
+    ''')
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_kpi_indicators_summary_delete
+        AFTER DELETE ON kpi_indicators
+        BEGIN
+            UPDATE kpi_template_summary SET
+                indicator_count = indicator_count - 1,
+                weight_sum = ROUND(weight_sum - COALESCE(OLD.weight, 0), 2),
+                max_sequence = (SELECT COALESCE(MAX(sequence_number), 0) FROM kpi_indicators WHERE template_id = OLD.template_id)
+            WHERE template_id = OLD.template_id;
+        END
+    ''')
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_kpi_indicators_summary_update
+        AFTER UPDATE OF template_id, weight, sequence_number ON kpi_indicators
+        BEGIN
+            UPDATE kpi_template_summary SET
+                indicator_count = indicator_count - 1,
+                weight_sum = ROUND(weight_sum - COALESCE(OLD.weight, 0), 2),
+                max_sequence = (SELECT COALESCE(MAX(sequence_number), 0) FROM kpi_indicators WHERE template_id = OLD.template_id)
+            WHERE template_id = OLD.template_id;
+            INSERT INTO kpi_template_summary (template_id, indicator_count, weight_sum, max_sequence)
+            SELECT NEW.template_id, 1, ROUND(COALESCE(NEW.weight, 0), 2), COALESCE(NEW.sequence_number, 0) WHERE 1
+            ON CONFLICT (template_id) DO UPDATE SET
+                indicator_count = indicator_count + 1,
+                weight_sum = ROUND(weight_sum + COALESCE(NEW.weight, 0), 2),
+                max_sequence = MAX(max_sequence, COALESCE(NEW.sequence_number, 0));
+        END
+    ''')
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_kpi_templates_summary_delete
+        AFTER DELETE ON kpi_templates
+        BEGIN
+            DELETE FROM kpi_template_summary WHERE template_id = OLD.template_id;
+        END
+    ''')
+
+# 9. 考核评分表（按员工、考核周期、指标记录得分）和考核结果表（加权总分由 scoring.py 计算）
+def _create_scores(c):
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS kpi_scores (
+            period TEXT NOT NULL,
+            indicator_id INTEGER NOT NULL,
+            username TEXT NOT NULL,
+            score REAL NOT NULL CHECK (score BETWEEN 0 AND 100),
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (period, indicator_id, username)
+        )
+    ''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_kpi_scores_user ON kpi_scores (username, period)')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS kpi_evaluations (
+            evaluation_id INTEGER PRIMARY KEY,
+            username TEXT NOT NULL,
+            period TEXT NOT NULL,
+            template_id INTEGER NOT NULL,
+            total_score REAL,
+            scored_count INTEGER NOT NULL DEFAULT 0,
+            computed_at TIMESTAMP,
+            UNIQUE (username, period)
+        )
+    ''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_kpi_evaluations_template ON kpi_evaluations (template_id, period)')
+    # 删除指标、用户或模板时一并删除对应的评分和考核结果
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_kpi_indicators_scores_delete
+        AFTER DELETE ON kpi_indicators
+        BEGIN
+            DELETE FROM kpi_scores WHERE indicator_id = OLD.indicator_id;
+        END
+    ''')
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_users_scores_delete
+        AFTER DELETE ON users
+        BEGIN
+            DELETE FROM kpi_scores WHERE username = OLD.username;
+            DELETE FROM kpi_evaluations WHERE username = OLD.username;
+        END
+    ''')
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_kpi_templates_evaluations_delete
+        AFTER DELETE ON kpi_templates
+        BEGIN
+            DELETE FROM kpi_evaluations WHERE template_id = OLD.template_id;
+        END
+    ''')
+
+# 部门考核汇总的增量维护语句（在触发器中使用）
+# {department} 为部门表达式，{period} / {score} 为考核周期和加权总分，总分为空的考核不计入
+_ROLLUP_ADD = '''
+    INSERT INTO kpi_department_rollups (period, department, evaluated_count, score_sum)
+    SELECT {period}, {department}, 1, {score} WHERE {department} IS NOT NULL AND {score} IS NOT NULL
+    ON CONFLICT (period, department) DO UPDATE SET
+        evaluated_count = evaluated_count + 1,
+        score_sum = ROUND(score_sum + excluded.score_sum, 2);
+    INSERT INTO kpi_department_score_buckets (period, department, bucket, employee_count)
+    SELECT {period}, {department}, MIN(CAST({score} / 10 AS INTEGER), 9), 1 WHERE {department} IS NOT NULL AND {score} IS NOT NULL
+    ON CONFLICT (period, department, bucket) DO UPDATE SET employee_count = employee_count + 1;
+'''
+_ROLLUP_REMOVE = '''
+    UPDATE kpi_department_rollups SET
+        evaluated_count = evaluated_count - 1,
+        score_sum = ROUND(score_sum - {score}, 2)
+    WHERE period = {period} AND department = {department} AND {score} IS NOT NULL;
+    DELETE FROM kpi_department_rollups WHERE period = {period} AND department = {department} AND evaluated_count <= 0;
+    UPDATE kpi_department_score_buckets SET employee_count = employee_count - 1
+    WHERE period = {period} AND department = {department} AND bucket = MIN(CAST({score} / 10 AS INTEGER), 9) AND {score} IS NOT NULL;
+    DELETE FROM kpi_department_score_buckets WHERE period = {period} AND department = {department} AND employee_count <= 0;
+'''
+# 员工调动部门或被删除时，按其所有考核结果整体移出原部门 / 移入新部门
+_ROLLUP_REMOVE_USER = '''
+    UPDATE kpi_department_rollups SET
+        evaluated_count = evaluated_count - 1,
+        score_sum = ROUND(score_sum - (SELECT total_score FROM kpi_evaluations e
+                                       WHERE e.username = OLD.username AND e.period = kpi_department_rollups.period), 2)
+    WHERE department = OLD.department
+      AND period IN (SELECT period FROM kpi_evaluations WHERE username = OLD.username AND total_score IS NOT NULL);
+    DELETE FROM kpi_department_rollups WHERE department = OLD.department AND evaluated_count <= 0;
+    UPDATE kpi_department_score_buckets SET employee_count = employee_count - 1
+    WHERE department = OLD.department
+      AND (period, bucket) IN (SELECT period, MIN(CAST(total_score / 10 AS INTEGER), 9) FROM kpi_evaluations
+                               WHERE username = OLD.username AND total_score IS NOT NULL);
+    DELETE FROM kpi_department_score_buckets WHERE department = OLD.department AND employee_count <= 0;
+'''
+_ROLLUP_ADD_USER = '''
+    INSERT INTO kpi_department_rollups (period, department, evaluated_count, score_sum)
+    SELECT period, NEW.department, 1, total_score FROM kpi_evaluations
+    WHERE username = NEW.username AND total_score IS NOT NULL AND NEW.department IS NOT NULL
+    ON CONFLICT (period, department) DO UPDATE SET
+        evaluated_count = evaluated_count + 1,
+        score_sum = ROUND(score_sum + excluded.score_sum, 2);
+    INSERT INTO kpi_department_score_buckets (period, department, bucket, employee_count)
+    SELECT period, NEW.department, MIN(CAST(total_score / 10 AS INTEGER), 9), 1 FROM kpi_evaluations
+    WHERE username = NEW.username AND total_score IS NOT NULL AND NEW.department IS NOT NULL
+    ON CONFLICT (period, department, bucket) DO UPDATE SET employee_count = employee_count + 1;
+'''
+
+# 10. 部门考核汇总表（参评人数、总分之和、分数段分布），由触发器随考核结果和员工部门变化增量维护
+def _create_department_rollups(c):
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS kpi_department_rollups (
+            period TEXT NOT NULL,
+            department TEXT NOT NULL,
+            evaluated_count INTEGER NOT NULL DEFAULT 0,
+            score_sum REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (period, department)
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS kpi_department_score_buckets (
+            period TEXT NOT NULL,
+            department TEXT NOT NULL,
+            bucket INTEGER NOT NULL,
+            employee_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (period, department, bucket)
+        )
+    ''')
+    rollups.rebuild(c)
+
+    new_department = '(SELECT department FROM users WHERE username = NEW.username)'
+    old_department = '(SELECT department FROM users WHERE username = OLD.username)'
+    c.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_kpi_evaluations_rollup_insert
+        AFTER INSERT ON kpi_evaluations WHEN NEW.total_score IS NOT NULL
+        BEGIN
+            {_ROLLUP_ADD.format(department=new_department, period='NEW.period', score='NEW.total_score')}
+        END
+    ''')
+    c.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_kpi_evaluations_rollup_update
+        AFTER UPDATE OF total_score, period ON kpi_evaluations
+        WHEN OLD.total_score IS NOT NEW.total_score OR OLD.period IS NOT NEW.period
+        BEGIN
+            {_ROLLUP_REMOVE.format(department=old_department, period='OLD.period', score='OLD.total_score')}
+            {_ROLLUP_ADD.format(department=new_department, period='NEW.period', score='NEW.total_score')}
+        END
+    ''')
+    # 删除员工时考核结果在员工删除之后才被删除，此时查不到部门，由员工删除触发器负责移出
+    c.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_kpi_evaluations_rollup_delete
+        AFTER DELETE ON kpi_evaluations WHEN OLD.total_score IS NOT NULL
+        BEGIN
+            {_ROLLUP_REMOVE.format(department=old_department, period='OLD.period', score='OLD.total_score')}
+        END
+    ''')
+    c.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_users_rollup_department_update
+        AFTER UPDATE OF department ON users WHEN OLD.department IS NOT NEW.department
+        BEGIN
+            {_ROLLUP_REMOVE_USER}
+            {_ROLLUP_ADD_USER}
+        END
+    ''')
+    c.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_users_rollup_delete
+        BEFORE DELETE ON users WHEN OLD.department IS NOT NULL
+        BEGIN
+            {_ROLLUP_REMOVE_USER}
+        END
+    ''')
+
+# 11. 模板版本：同一模板的各个版本属于同一个 family_id，发布后的版本（published_at 不为空）不能再修改
+# 考核结果引用具体的版本；已有考核结果引用的模板直接标记为已发布
+def _create_template_versions(c):
+    c.execute('ALTER TABLE kpi_templates ADD COLUMN family_id INTEGER')
+    c.execute('ALTER TABLE kpi_templates ADD COLUMN version INTEGER NOT NULL DEFAULT 1')
+    c.execute('ALTER TABLE kpi_templates ADD COLUMN published_at TIMESTAMP')
+    c.execute('UPDATE kpi_templates SET family_id = template_id')
+    c.execute('''
+        UPDATE kpi_templates SET published_at = CURRENT_TIMESTAMP
+        WHERE template_id IN (SELECT template_id FROM kpi_evaluations)
+    ''')
+    c.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_kpi_templates_family ON kpi_templates (family_id, version)')
+    # 新建的模板（不是已有模板的新版本）自成一个 family
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_kpi_templates_family
+        AFTER INSERT ON kpi_templates WHEN NEW.family_id IS NULL
+        BEGIN
+            UPDATE kpi_templates SET family_id = NEW.template_id WHERE template_id = NEW.template_id;
+        END
+    ''')
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_kpi_templates_published_update
+        BEFORE UPDATE OF template_name, description, family_id, version ON kpi_templates
+        WHEN OLD.published_at IS NOT NULL
+        BEGIN
+            SELECT RAISE(ABORT, '已发布的模板版本不能修改');
+        END
+    ''')
+    # 已发布版本的指标不能增删改（删除模板时先撤销发布，之后其指标不再受限制）
+    published = 'EXISTS (SELECT 1 FROM kpi_templates WHERE template_id = {}.template_id AND published_at IS NOT NULL)'
+    for event, checks in (
+        ('INSERT', [published.format('NEW')]),
+        ('UPDATE', [published.format('OLD'), published.format('NEW')]),
+        ('DELETE', [published.format('OLD')]),
+    ):
+        c.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_kpi_indicators_published_{event.lower()}
+            BEFORE {event} ON kpi_indicators
+            BEGIN
+                SELECT RAISE(ABORT, '已发布的模板版本不能修改') WHERE {' OR '.join(checks)};
+            END
+        ''')
+
+# 12. 指标和模板的全文索引（FTS5 trigram 分词，按子串匹配，中文不需要分词），由触发器与原表保持同步
+# 只更新序号、权重等其他列时不改动索引；PostgreSQL 没有 FTS5，搜索时直接扫描原表
+def _create_search_index(c):
+    if repository.get_pool().dialect != 'sqlite':
+        return
+    for table, key, columns in (
+        ('kpi_indicators', 'indicator_id', ['name', 'description', 'evaluation_criteria']),
+        ('kpi_templates', 'template_id', ['template_name', 'description']),
+    ):
+        fts = f'{table}_fts'
+        names = ', '.join(columns)
+        new_values = ', '.join(f'NEW.{column}' for column in columns)
+        old_values = ', '.join(f'OLD.{column}' for column in columns)
+        c.execute(f'''
+            CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+                {names}, content='{table}', content_rowid='{key}', tokenize='trigram'
+            )
+        ''')
+        c.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+        c.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{fts}_insert AFTER INSERT ON {table}
+            BEGIN
+                INSERT INTO {fts} (rowid, {names}) VALUES (NEW.{key}, {new_values});
+            END
+        ''')
+        c.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{fts}_delete AFTER DELETE ON {table}
+            BEGIN
+                INSERT INTO {fts} ({fts}, rowid, {names}) VALUES ('delete', OLD.{key}, {old_values});
+            END
+        ''')
+        c.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{fts}_update AFTER UPDATE OF {names} ON {table}
+            BEGIN
+                INSERT INTO {fts} ({fts}, rowid, {names}) VALUES ('delete', OLD.{key}, {old_values});
+                INSERT INTO {fts} (rowid, {names}) VALUES (NEW.{key}, {new_values});
+            END
+        ''')
+
+# 按版本号排列的迁移列表，只能在末尾追加
+MIGRATIONS = [
+    (1, '创建基础表', _create_base_tables),
+    (2, '创建默认管理员', _create_default_admin),
+    (3, '添加指标索引', _create_indicator_indexes),
+    (4, '添加用户名索引', _create_username_lower_index),
+    (5, '添加用户筛选索引', _create_user_filter_indexes),
+    (6, '添加部门维度表', _create_departments),
+    (7, '添加模板创建时间索引', _create_template_created_at_index),
+    (8, '添加模板汇总表', _create_template_summary),
+    (9, '添加考核评分表', _create_scores),
+    (10, '添加部门考核汇总表', _create_department_rollups),
+    (11, '添加模板版本', _create_template_versions),
+    (12, '添加全文索引', _create_search_index),
+]
+
+# 获取当前数据库的结构版本
+def get_current_version(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    return conn.execute('SELECT COALESCE(MAX(version), 0) FROM schema_version').fetchone()[0]
+
+# 执行尚未应用的迁移，返回本次应用的版本号列表
+def migrate(target=None):
+    applied = []
+    try:
+        with db.get_db_connection() as conn:
+            for version, description, step in MIGRATIONS:
+                if target is not None and version > target:
+                    break
+                # 使用 IMMEDIATE 事务，避免多个进程同时执行同一步迁移
+                conn.execute('BEGIN IMMEDIATE')
+                if version <= get_current_version(conn):
+                    conn.rollback()
+                    continue
+                step(conn.cursor())
+                conn.execute('INSERT INTO schema_version (version, description) VALUES (?, ?)',
+                        (version, description))
+                conn.commit()
+                applied.append(version)
+    except repository.DATABASE_ERRORS as e:
+        st.error(f'数据库错误: {str(e)}')
+        st.error('建议操作: 1. 恢复备份数据库 2. 删除当前数据库重新初始化')
+        raise
+    return applied
+
+# 每个进程只执行一次迁移，之后的重跑直接返回
+@st.cache_resource
+def ensure_schema():
+    return migrate()
+
+# 命令行入口：部署时提前执行迁移
+def main():
+    parser = argparse.ArgumentParser(description='KPI考核系统数据库迁移')
+    parser.add_argument('--db', default=repository.DB_PATH, help='数据库文件路径')
+    parser.add_argument('--target', type=int, help='迁移到指定版本')
+    parser.add_argument('--status', action='store_true', help='只显示当前版本')
+    args = parser.parse_args()
+
+    repository.DB_PATH = args.db
+    if args.status:
+        with db.get_db_connection() as conn:
+            current = get_current_version(conn)
+        print(f'当前版本: {current} / 最新版本: {MIGRATIONS[-1][0]}')
+        return
+
+    applied = migrate(args.target)
+    if applied:
+        print(f'已应用迁移: {", ".join(str(v) for v in applied)}')
+    else:
+        print('数据库已是最新版本')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import bcrypt
+import streamlit as st
+
+# bcrypt 的计算强度（2 的幂次轮数），可通过环境变量配置
+BCRYPT_ROUNDS = int(os.environ.get('KPI_BCRYPT_ROUNDS', '12'))
+# 后台哈希线程数（bcrypt 计算时会释放 GIL）
+HASH_WORKERS = int(os.environ.get('KPI_HASH_WORKERS', '2'))
+
+# 计算密码哈希
+def hash_password(password, rounds=None):
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds or BCRYPT_ROUNDS)).decode()
+
+# 从哈希值中读取 bcrypt 轮数，无法识别时返回 None
+def get_rounds(hashed_password):
+    try:
+        return int(hashed_password.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+# 判断已存储的哈希是否需要按当前配置重新计算
+def needs_rehash(hashed_password):
+    return get_rounds(hashed_password) != BCRYPT_ROUNDS
+
+# 后台哈希线程池（进程内共享）
+@st.cache_resource
+def get_hash_executor():
+    return ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix='password-hash')
+
+# 每个用户最近一次提交的哈希任务，旧任务完成时不会覆盖新密码；任务状态报告一次后删除
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+# 在后台计算密码哈希，完成后调用 store(hashed_password, is_current) 写入
+# store 在写线程中执行写入前再调用 is_current() 检查，返回 False 时说明已有更新的任务，不写入；
+# 写操作按提交顺序执行，检查之后登记的新任务一定在这次写入之后写入。等待写入期间不持有锁
+# track 为 False 时没有页面查询任务状态，任务完成后直接删除
+def submit_hash(username, password, store, track=True):
+    username = username.lower()
+    token = object()
+
+    def is_current():
+        with _jobs_lock:
+            return _jobs.get(username, (None,))[0] is token
+
+    def run():
+        hashed_password = hash_password(password)
+        if is_current():
+            store(hashed_password, is_current)
+
+    def forget(future):
+        with _jobs_lock:
+            if _jobs.get(username, (None,))[0] is token:
+                del _jobs[username]
+
+    with _jobs_lock:
+        future = get_hash_executor().submit(run)
+        _jobs[username] = (token, future)
+    if not track:
+        future.add_done_callback(forget)
+    return future
+
+# 获取用户最近一次哈希任务的状态: None / 'pending' / 'done' / 'failed'，已完成的任务报告后删除
+def get_job_status(username):
+    username = username.lower()
+    with _jobs_lock:
+        job = _jobs.get(username)
+        if job is None:
+            return None
+        future = job[1]
+        if not future.done():
+            return 'pending'
+        del _jobs[username]
+    return 'failed' if future.exception() is not None else 'done'
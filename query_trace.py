@@ -0,0 +1,202 @@
+import functools
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+# 慢查询阈值（毫秒）
+SLOW_QUERY_MS = float(os.environ.get('KPI_SLOW_QUERY_MS', '100'))
+# 查询日志文件（JSONL），为空时不写日志
+QUERY_LOG_PATH = os.environ.get('KPI_QUERY_LOG', '')
+
+# 记录调用者时只考虑仓库内的模块
+_THIS_FILE = os.path.abspath(__file__)
+_ROOT = os.path.dirname(_THIS_FILE)
+
+# 当前线程正在记录的重跑（后台线程没有重跑，不记录）
+_local = threading.local()
+_log_lock = threading.Lock()
+
+# 查找发起查询的业务函数（仓库内、连接池和数据库后端之外的第一个栈帧）
+def _caller():
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if filename.startswith(_ROOT) and filename != _THIS_FILE:
+            module = os.path.splitext(os.path.relpath(filename, _ROOT))[0].replace(os.sep, '.')
+            pooled = module in ('db', 'repository') and frame.f_code.co_name in ('connection', 'acquire', 'release')
+            if module != 'backends' and not pooled:
+                return f'{module}.{frame.f_code.co_name}'
+        frame = frame.f_back
+    return None
+
+# 开始记录一条语句，返回 (记录, 开始时间)；当前线程未在记录时返回 (None, None)
+def begin_query(sql):
+    trace = getattr(_local, 'trace', None)
+    if trace is None:
+        return None, None
+    record = {'sql': ' '.join(sql.split()), 'caller': _caller(), 'ms': 0.0, 'rows': 0}
+    trace.append(record)
+    return record, time.perf_counter()
+
+# 累加一次执行或读取的耗时和行数
+def end_query(record, started, rows=0):
+    if started is not None and record is not None:
+        record['ms'] += (time.perf_counter() - started) * 1000
+        record['rows'] += rows
+
+# 记录语句执行耗时和返回行数的游标
+class TracingCursor(sqlite3.Cursor):
+    _record = None
+
+    def _start(self, sql):
+        self._record, started = begin_query(sql)
+        return started
+
+    def _finish(self, started, rows=0):
+        end_query(self._record, started, rows)
+
+    def execute(self, sql, parameters=()):
+        started = self._start(sql)
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._finish(started, max(self.rowcount, 0))
+
+    def executemany(self, sql, seq_of_parameters):
+        started = self._start(sql)
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._finish(started, max(self.rowcount, 0))
+
+    def fetchone(self):
+        started = time.perf_counter() if self._record is not None else None
+        row = super().fetchone()
+        self._finish(started, 1 if row is not None else 0)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter() if self._record is not None else None
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._finish(started, len(rows))
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter() if self._record is not None else None
+        rows = super().fetchall()
+        self._finish(started, len(rows))
+        return rows
+
+    def __next__(self):
+        started = time.perf_counter() if self._record is not None else None
+        row = super().__next__()
+        self._finish(started, 1)
+        return row
+
+# 所有语句都经过 TracingCursor 的连接（sqlite3.connect 的 factory）
+class TracingConnection(sqlite3.Connection):
+    def cursor(self, factory=TracingCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+# 当前线程正在使用的查询记录列表（未在记录时为 None）
+def current_trace():
+    return getattr(_local, 'trace', None)
+
+# 临时把查询记录到指定列表（写线程代替提交写操作的会话执行语句时使用）
+@contextmanager
+def use_trace(trace):
+    previous = getattr(_local, 'trace', None)
+    _local.trace = trace
+    try:
+        yield
+    finally:
+        _local.trace = previous
+
+# 开始记录本次重跑的查询
+def start_rerun():
+    _local.trace = []
+    _local.started = time.perf_counter()
+
+# 结束记录，汇总本次重跑的查询，写入日志并返回汇总结果
+def finish_rerun(page=None):
+    trace = getattr(_local, 'trace', None)
+    if trace is None:
+        return None
+    _local.trace = None
+    summary = summarize(trace)
+    summary['rerun_ms'] = round((time.perf_counter() - _local.started) * 1000, 3)
+    summary['page'] = page
+    if QUERY_LOG_PATH:
+        _write_log(summary)
+    return summary
+
+# 页面片段单独重跑结束时的回调 fn(summary)（由页面入口注册，例如保存到会话中供性能面板显示）
+_fragment_listener = None
+
+def set_fragment_listener(fn):
+    global _fragment_listener
+    _fragment_listener = fn
+
+# 页面片段（fragment）的查询记录：在整页重跑中调用时计入整页；
+# 单独重跑时不经过页面入口，这里单独开始和结束记录，同样写入日志
+def traced_fragment(page):
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if current_trace() is not None:
+                return fn(*args, **kwargs)
+            start_rerun()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                summary = finish_rerun(page)
+                if _fragment_listener is not None:
+                    _fragment_listener(summary)
+        return wrapper
+    return decorator
+
+# 按 (语句, 调用者) 汇总查询记录
+def summarize(trace):
+    groups = {}
+    for record in trace:
+        key = (record['sql'], record['caller'])
+        group = groups.setdefault(key, {'sql': record['sql'], 'caller': record['caller'],
+                                        'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'rows': 0})
+        group['count'] += 1
+        group['total_ms'] += record['ms']
+        group['max_ms'] = max(group['max_ms'], record['ms'])
+        group['rows'] += record['rows']
+    statements = sorted(groups.values(), key=lambda group: group['total_ms'], reverse=True)
+    for group in statements:
+        group['total_ms'] = round(group['total_ms'], 3)
+        group['max_ms'] = round(group['max_ms'], 3)
+    return {
+        'queries': len(trace),
+        'query_ms': round(sum(record['ms'] for record in trace), 3),
+        'statements': statements,
+        'slow': [dict(record, ms=round(record['ms'], 3)) for record in trace if record['ms'] >= SLOW_QUERY_MS],
+    }
+
+# 追加一行 JSONL 日志：每次重跑一行汇总，慢查询附带明细
+def _write_log(summary):
+    entry = {
+        'time': datetime.now().isoformat(timespec='milliseconds'),
+        'page': summary['page'],
+        'rerun_ms': summary['rerun_ms'],
+        'queries': summary['queries'],
+        'query_ms': summary['query_ms'],
+        'slow': summary['slow'],
+    }
+    with _log_lock, open(QUERY_LOG_PATH, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + '\n')
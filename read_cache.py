@@ -0,0 +1,95 @@
+import copy
+import functools
+import os
+import threading
+from collections import OrderedDict
+
+# 进程级读缓存：所有会话共享常用查询的结果，按参数缓存，按表失效
+# 本进程的写操作提交后按写入的表失效；其他进程的写入通过 data_version 发现，此时清空整个缓存
+
+# 缓存的最大结果数，超过后淘汰最久未使用的结果；0 表示不缓存
+READ_CACHE_SIZE = int(os.environ.get('KPI_READ_CACHE_SIZE', '256'))
+
+class ReadCache:
+    # data_version 返回数据库的外部修改版本号，暂时无法检查时返回 None
+    def __init__(self, max_entries=READ_CACHE_SIZE, data_version=None):
+        self.max_entries = max_entries
+        self._data_version = data_version
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._table_versions = {}
+        self._epoch = 0
+        self._last_data_version = None
+        self._counts = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+
+    # 使依赖这些表的缓存结果失效；tables 为 None 时清空整个缓存
+    def invalidate(self, tables=None):
+        with self._lock:
+            self._counts['invalidations'] += 1
+            if tables is None:
+                self._epoch += 1
+                self._entries.clear()
+                return
+            for table in tables:
+                self._table_versions[table] = self._table_versions.get(table, 0) + 1
+
+    # 其他进程写入后 data_version 会变化，无法知道写了哪些表，清空整个缓存
+    def _check_external_writes(self):
+        if self._data_version is None:
+            return
+        version = self._data_version()
+        if version is None or version == self._last_data_version:
+            return
+        if self._last_data_version is not None:
+            self.invalidate()
+        self._last_data_version = version
+
+    # 缓存结果记录查询前各表的版本，查询期间有写入提交时结果不会被当作最新结果使用
+    def _stamp(self, tables):
+        return (self._epoch,) + tuple(self._table_versions.get(table, 0) for table in tables)
+
+    # 返回 key 对应的缓存结果（浅拷贝，调用方可以修改外层的列表或字典），不存在或已失效时调用 load 查询并缓存
+    # 外层容器里的值在各调用方之间共享，必须是不可变的（namedtuple 记录、元组、数字、字符串）
+    def get(self, key, tables, load):
+        if self.max_entries <= 0:
+            return load()
+        self._check_external_writes()
+        with self._lock:
+            stamp = self._stamp(tables)
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == stamp:
+                self._entries.move_to_end(key)
+                self._counts['hits'] += 1
+                return copy.copy(entry[1])
+            self._counts['misses'] += 1
+        value = load()
+        with self._lock:
+            self._entries[key] = (stamp, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counts['evictions'] += 1
+        return copy.copy(value)
+
+    # 缓存装饰器：结果依赖 tables 中的表，按函数名和参数缓存
+    def cached(self, *tables):
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                key = (fn.__name__, args, tuple(sorted(kwargs.items())))
+                return self.get(key, tables, lambda: fn(*args, **kwargs))
+            return wrapper
+        return decorator
+
+    # 命中次数、未命中次数、淘汰次数和当前缓存的结果数
+    def stats(self):
+        with self._lock:
+            counts = dict(self._counts)
+            entries = len(self._entries)
+        lookups = counts['hits'] + counts['misses']
+        return dict(
+            counts,
+            entries=entries,
+            max_entries=self.max_entries,
+            hit_rate=round(counts['hits'] / lookups, 3) if lookups else 0.0,
+        )
@@ -0,0 +1,69 @@
+import argparse
+import repository
+
+# 部门考核汇总：平时由触发器增量维护（见 migrations.py），这里提供全量重建和一致性检查
+
+# 从考核结果全量计算部门汇总的查询
+ROLLUP_QUERY = '''
+    SELECT e.period, u.department, COUNT(*) AS evaluated_count, ROUND(SUM(e.total_score), 2) AS score_sum
+    FROM kpi_evaluations e JOIN users u ON u.username = e.username
+    WHERE e.total_score IS NOT NULL AND u.department IS NOT NULL
+    GROUP BY e.period, u.department
+'''
+BUCKET_QUERY = '''
+    SELECT e.period, u.department, MIN(CAST(e.total_score / 10 AS INTEGER), 9) AS bucket, COUNT(*) AS employee_count
+    FROM kpi_evaluations e JOIN users u ON u.username = e.username
+    WHERE e.total_score IS NOT NULL AND u.department IS NOT NULL
+    GROUP BY e.period, u.department, bucket
+'''
+
+# 全量重建汇总表（在调用方的事务中执行）
+def rebuild(c):
+    c.execute('DELETE FROM kpi_department_rollups')
+    c.execute('DELETE FROM kpi_department_score_buckets')
+    c.execute(f'INSERT INTO kpi_department_rollups (period, department, evaluated_count, score_sum) {ROLLUP_QUERY}')
+    c.execute(f'INSERT INTO kpi_department_score_buckets (period, department, bucket, employee_count) {BUCKET_QUERY}')
+
+# 对比汇总表与全量计算结果，返回不一致的 (表名, 周期, 部门) 列表
+def check(c):
+    mismatches = []
+    for table, query, key, values in (
+        ('kpi_department_rollups', ROLLUP_QUERY, ('period', 'department'), ('evaluated_count', 'score_sum')),
+        ('kpi_department_score_buckets', BUCKET_QUERY, ('period', 'department', 'bucket'), ('employee_count',)),
+    ):
+        join = ' AND '.join(f'a.{column} = b.{column}' for column in key)
+        differ = ' OR '.join(f'ABS(COALESCE(a.{column}, 0) - COALESCE(b.{column}, 0)) > 0.005' for column in values)
+        # SQLite 3.39 之前不支持 FULL JOIN，两个方向各做一次 LEFT JOIN
+        rows = c.execute(f'''
+            WITH expected AS ({query})
+            SELECT a.period, a.department FROM {table} a LEFT JOIN expected b ON {join} WHERE {differ}
+            UNION
+            SELECT b.period, b.department FROM expected b LEFT JOIN {table} a ON {join} WHERE {differ}
+        ''').fetchall()
+        mismatches += [(table, period, department) for period, department in rows]
+    return mismatches
+
+# 命令行入口：检查汇总表是否与考核结果一致，必要时全量重建
+def main():
+    parser = argparse.ArgumentParser(description='部门考核汇总检查与重建')
+    parser.add_argument('--db', default=repository.DB_PATH, help='数据库文件路径')
+    parser.add_argument('--rebuild', action='store_true', help='全量重建汇总表')
+    args = parser.parse_args()
+
+    repository.DB_PATH = args.db
+    with repository.connection() as conn:
+        if args.rebuild:
+            conn.execute('BEGIN IMMEDIATE')
+            rebuild(conn)
+            print('汇总表已重建')
+            return
+        mismatches = check(conn)
+    for table, period, department in mismatches:
+        print(f'{table}: {period} {department} 不一致')
+    if mismatches:
+        print(f'共 {len(mismatches)} 处不一致，可使用 --rebuild 重建')
+        raise SystemExit(1)
+    print('汇总表与考核结果一致')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+import argparse
+import time
+import numpy as np
+import repository
+
+# 考核评分计算：不依赖 Streamlit，可在页面、批处理任务和命令行中使用
+
+# 向量化计算加权总分（得分 0~100，权重为百分比）
+# employee_index / indicator_index 为每条得分所属员工和指标的下标，未评分的指标按 0 分计
+def weighted_totals(employee_index, indicator_index, scores, weights, employee_count):
+    weighted = scores * weights[indicator_index] / 100
+    totals = np.bincount(employee_index, weights=weighted, minlength=employee_count)
+    scored_counts = np.bincount(employee_index, minlength=employee_count)
+    return np.round(totals, 2), scored_counts
+
+# 得分明细的数组类型
+SCORE_DTYPE = np.dtype([('evaluation_id', np.int64), ('indicator_id', np.int64), ('score', np.float64)])
+
+# 重新计算某个模板在某个考核周期下所有员工（或指定员工）的加权总分，返回计算的员工数
+def recompute(template_id, period, username=None):
+    indicators, evaluation_ids, rows = repository.load_template_scores(template_id, period, username)
+    if not evaluation_ids:
+        return 0
+
+    indicator_ids = np.fromiter((row[0] for row in indicators), dtype=np.int64, count=len(indicators))
+    weights = np.fromiter((row[1] for row in indicators), dtype=np.float64, count=len(indicators))
+    evaluations = np.array(evaluation_ids, dtype=np.int64)
+    scores = np.fromiter(rows, dtype=SCORE_DTYPE, count=len(rows))
+
+    # 参评记录和指标都已按编号排序，用二分查找得到下标；不属于该模板的指标不计分
+    employee_index = np.searchsorted(evaluations, scores['evaluation_id'])
+    indicator_index = np.searchsorted(indicator_ids, scores['indicator_id'])
+    valid = indicator_index < len(indicator_ids)
+    valid[valid] = indicator_ids[indicator_index[valid]] == scores['indicator_id'][valid]
+
+    totals, scored_counts = weighted_totals(employee_index[valid], indicator_index[valid], scores['score'][valid],
+                                            weights, len(evaluations))
+    repository.store_totals(template_id, zip(evaluation_ids, totals.tolist(), scored_counts.tolist()))
+    return len(evaluation_ids)
+
+# 命令行入口：模板权重调整后批量重新计算总分
+def main():
+    parser = argparse.ArgumentParser(description='重新计算考核总分')
+    parser.add_argument('template_id', type=int, help='模板编号')
+    parser.add_argument('period', help='考核周期，例如 2026-10')
+    parser.add_argument('--db', default=repository.DB_PATH, help='数据库文件路径')
+    args = parser.parse_args()
+
+    repository.DB_PATH = args.db
+    started = time.perf_counter()
+    count = recompute(args.template_id, args.period)
+    print(f'已计算 {count} 名员工的总分，耗时 {time.perf_counter() - started:.2f} 秒')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,212 @@
+import csv
+import io
+import streamlit as st
+import repository
+
+# 导入文件的列名（中文表头或字段名均可）
+IMPORT_COLUMNS = {
+    '模板名称': 'template_name',
+    '模板描述': 'template_description',
+    '序号': 'sequence_number',
+    '指标分类': 'category',
+    '指标名称': 'name',
+    '指标解释': 'description',
+    '评价标准': 'evaluation_criteria',
+    '指标权重(%)': 'weight',
+    '指标权重': 'weight',
+}
+
+# 逐行读取 CSV 文件，返回 (行号, 字段字典)
+def _iter_csv(file):
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    reader = csv.reader(text)
+    header = next(reader, None)
+    if header is None:
+        return
+    for row_number, values in enumerate(reader, start=2):
+        yield row_number, dict(zip(header, values))
+
+# 逐行读取 Excel 文件（只读模式，不把整个工作簿读入内存）
+def _iter_excel(file):
+    from openpyxl import load_workbook
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        header = ['' if value is None else str(value).strip() for value in header]
+        for row_number, values in enumerate(rows, start=2):
+            yield row_number, dict(zip(header, values))
+    finally:
+        workbook.close()
+
+# 按文件扩展名读取导入文件，按 columns 把表头统一为字段名
+def read_rows(file, file_name, columns=IMPORT_COLUMNS):
+    if file_name.lower().endswith(('.xlsx', '.xlsm')):
+        rows = _iter_excel(file)
+    else:
+        rows = _iter_csv(file)
+    for row_number, raw in rows:
+        record = {}
+        for column, value in raw.items():
+            field = columns.get(str(column).strip(), str(column).strip())
+            record[field] = value.strip() if isinstance(value, str) else value
+        # 跳过空行
+        if any(value not in (None, '') for value in record.values()):
+            yield row_number, record
+
+# 校验单行数据，返回 (指标元组, 错误信息)
+def _parse_row(record):
+    name = record.get('name')
+    if not name:
+        return None, '指标名称不能为空'
+    try:
+        weight = float(record.get('weight'))
+    except (TypeError, ValueError):
+        return None, '指标权重必须是数字'
+    if not 0 <= weight <= 100:
+        return None, '指标权重必须在0到100之间'
+    sequence_number = record.get('sequence_number')
+    if sequence_number in (None, ''):
+        sequence_number = None
+    else:
+        try:
+            sequence_number = int(float(sequence_number))
+        except (TypeError, ValueError):
+            return None, '序号必须是整数'
+    return (sequence_number, record.get('category') or '', str(name), record.get('description') or '',
+            record.get('evaluation_criteria') or '', weight), None
+
+# 在写线程中读取已有模板的权重总和并写入，保证校验结果与写入一致；仅校验时在读连接中执行，不写入
+# 同名模板有多个版本时追加到最新版本，最新版本已发布时不能追加
+def _write_templates(conn, templates, errors, report, dry_run):
+    names = list(templates)
+    existing = {}
+    for start in range(0, len(names), 500):
+        chunk = names[start:start + 500]
+        placeholders = ', '.join('?' * len(chunk))
+        for template_name, template_id, published_at, weight_sum, max_sequence in conn.execute(f'''
+            SELECT t.template_name, t.template_id, p.published_at, COALESCE(s.weight_sum, 0), COALESCE(s.max_sequence, 0)
+            FROM (SELECT template_name, MAX(template_id) AS template_id FROM kpi_templates
+                  WHERE template_name IN ({placeholders}) GROUP BY template_name) t
+            JOIN kpi_templates p ON p.template_id = t.template_id
+            LEFT JOIN kpi_template_summary s ON s.template_id = t.template_id
+        ''', chunk):
+            existing[template_name] = (template_id, published_at, weight_sum, max_sequence)
+
+    accepted = {}
+    for template_name, template in templates.items():
+        if not template['valid']:
+            # 同一模板的其他行有错误时整个模板跳过，本身正确的行也计入未导入的行
+            for row_number in template['rows']:
+                errors.append({'row': row_number, 'template_name': template_name,
+                               'error': '同模板其他行有错误，整个模板未导入'})
+            continue
+        if not template['indicators']:
+            continue
+        template_id, published_at, weight_sum, max_sequence = existing.get(template_name, (None, None, 0, 0))
+        if published_at is not None:
+            for row_number in template['rows']:
+                errors.append({'row': row_number, 'template_name': template_name,
+                               'error': '模板的最新版本已发布，请先创建新版本'})
+            continue
+        total = round(weight_sum + sum(indicator[-1] for indicator in template['indicators']), 2)
+        if total > 100:
+            for row_number in template['rows']:
+                errors.append({'row': row_number, 'template_name': template_name,
+                               'error': f'模板权重总和 {total:g}% 超过100%'})
+            continue
+        # 未填写序号的指标接在已有最大序号之后
+        indicators = []
+        for indicator in template['indicators']:
+            if indicator[0] is None:
+                max_sequence += 1
+                indicator = (max_sequence,) + indicator[1:]
+            else:
+                max_sequence = max(max_sequence, indicator[0])
+            indicators.append(indicator)
+        accepted[template_name] = (template_id, template['description'], indicators)
+
+    report['templates'] = sum(1 for template_id, _, _ in accepted.values() if template_id is None)
+    report['indicators'] = sum(len(indicators) for _, _, indicators in accepted.values())
+    errors.sort(key=lambda error: error['row'])
+    if dry_run or not accepted:
+        return report
+
+    # 批量创建新模板，再按名称取回新分配的模板编号
+    last_id = conn.execute('SELECT COALESCE(MAX(template_id), 0) FROM kpi_templates').fetchone()[0]
+    new_templates = [(name, description) for name, (template_id, description, _) in accepted.items() if template_id is None]
+    conn.executemany('INSERT INTO kpi_templates (template_name, description) VALUES (?, ?)', new_templates)
+    new_ids = dict(conn.execute(
+        'SELECT template_name, template_id FROM kpi_templates WHERE template_id > ?', (last_id,)
+    ).fetchall())
+
+    conn.executemany('''
+        INSERT INTO kpi_indicators
+        (template_id, sequence_number, category, name, description, evaluation_criteria, weight)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', (
+        (template_id if template_id is not None else new_ids[name],) + indicator
+        for name, (template_id, _, indicators) in accepted.items()
+        for indicator in indicators
+    ))
+    return report
+
+# 批量导入模板和指标：先在内存中校验每个模板的权重总和，再在一个事务中批量写入
+# 同名模板已存在时追加到已有模板；有错误的模板整体跳过，其余模板照常导入
+def import_templates(rows, dry_run=False):
+    errors = []
+    templates = {}
+    for row_number, record in rows:
+        template_name = record.get('template_name')
+        if not template_name:
+            errors.append({'row': row_number, 'template_name': '', 'error': '模板名称不能为空'})
+            continue
+        template = templates.setdefault(str(template_name), {
+            'description': record.get('template_description') or '',
+            'indicators': [],
+            'rows': [],
+            'valid': True,
+        })
+        indicator, error = _parse_row(record)
+        if error:
+            errors.append({'row': row_number, 'template_name': template_name, 'error': error})
+            template['valid'] = False
+            continue
+        template['indicators'].append(indicator)
+        template['rows'].append(row_number)
+
+    report = {'templates': 0, 'indicators': 0, 'errors': errors, 'dry_run': dry_run}
+    if not templates:
+        return report
+
+    # 仅校验时只读取已有模板，使用连接池中的读连接，不在写线程中排队
+    if dry_run:
+        with repository.connection() as conn:
+            return _write_templates(conn, templates, errors, report, dry_run)
+    return repository.write(_write_templates, templates, errors, report, dry_run)
+
+# 批量导入页面区块
+def template_import_section():
+    with st.expander('批量导入模板'):
+        st.caption('表头: ' + ', '.join(['模板名称', '模板描述', '序号', '指标分类', '指标名称', '指标解释', '评价标准', '指标权重(%)']))
+        uploaded_file = st.file_uploader('选择CSV或Excel文件', type=['csv', 'xlsx'], key='template_import_file')
+        dry_run = st.checkbox('仅校验，不写入', value=True, key='template_import_dry_run')
+
+        if st.button('开始导入', key='template_import_btn'):
+            if uploaded_file is None:
+                st.warning('请先选择文件')
+                return
+            try:
+                report = import_templates(read_rows(uploaded_file, uploaded_file.name), dry_run=dry_run)
+            except Exception as e:
+                st.error(f'导入失败: {str(e)}')
+                return
+
+            action = '校验通过' if dry_run else '已导入'
+            st.success(f"{action}: 新建模板 {report['templates']} 个，指标 {report['indicators']} 条")
+            if report['errors']:
+                st.warning(f"{len(report['errors'])} 行未导入")
+                st.dataframe(report['errors'], hide_index=True,
+                             column_config={'row': '行号', 'template_name': '模板名称', 'error': '错误'})
@@ -1,8 +1,151 @@
 import streamlit as st
-import pandas as pd
 import db
+import export
+import query_trace
+import repository
+import template_import
 
-# 考核模板管理页面
+# 模板列表每页显示的模板数
+TEMPLATE_PAGE_SIZE = 20
+# 修改已发布版本时的提示
+PUBLISHED_MESSAGE = '已发布的模板版本不能修改，请先创建新版本'
+# 编辑指标表单中输入框的 key
+INDICATOR_INPUT_KEYS = ['edit_indicator_seq', 'edit_indicator_category', 'edit_indicator_name',
+                        'edit_indicator_desc', 'edit_indicator_criteria', 'edit_indicator_weight']
+
+# 展开或收起模板的指标列表（按钮回调，在页面重跑前执行）
+def _toggle_viewing_template(template_id):
+    viewing_templates = st.session_state.setdefault('viewing_templates', set())
+    if template_id in viewing_templates:
+        viewing_templates.discard(template_id)
+    else:
+        viewing_templates.add(template_id)
+
+# 进入或退出指标的批量编辑（按钮回调，在页面重跑前执行）
+def _set_bulk_editing_template(template_id):
+    st.session_state['bulk_editing_template'] = template_id
+
+# 表格中可编辑的指标列及其默认值
+GRID_COLUMNS = {
+    'sequence_number': None,
+    'category': '',
+    'name': '',
+    'description': '',
+    'evaluation_criteria': '',
+    'weight': None,
+}
+
+# 把表格编辑器记录的变更（按行号记录的修改、新增行和删除行）转换为指标的变更集
+# 返回 (inserts, updates, deletes)，有未填写指标名称或权重的行时返回 None
+def _indicator_changes(indicators, changes):
+    deletes = [indicators[row].indicator_id for row in changes.get('deleted_rows', [])]
+    deleted = set(deletes)
+    next_seq = max((indicator.sequence_number or 0 for indicator in indicators), default=0) + 1
+    updates = []
+    for row, edited in changes.get('edited_rows', {}).items():
+        indicator = indicators[int(row)]
+        if indicator.indicator_id in deleted:
+            continue
+        values = {column: edited.get(column, getattr(indicator, column)) for column in GRID_COLUMNS}
+        if not values['name'] or not values['weight']:
+            return None
+        update = (indicator.indicator_id,) + tuple(values.values())
+        # 只保存与原值不同的行
+        if update != tuple(getattr(indicator, column) for column in ('indicator_id',) + tuple(GRID_COLUMNS)):
+            updates.append(update)
+        next_seq = max(next_seq, (values['sequence_number'] or 0) + 1)
+    inserts = []
+    for added in changes.get('added_rows', []):
+        values = {column: added.get(column) if added.get(column) is not None else default
+                  for column, default in GRID_COLUMNS.items()}
+        if not values['name'] or not values['weight']:
+            return None
+        # 未填写序号的新指标依次排在最后
+        if values['sequence_number'] is None:
+            values['sequence_number'] = next_seq
+        next_seq = max(next_seq, values['sequence_number'] + 1)
+        inserts.append(tuple(values.values()))
+    return inserts, updates, deletes
+
+# 指标的批量编辑表格：修改、新增、删除和调整序号都只记录在表格中，保存时一次提交
+def indicator_grid(template_id, indicators):
+    st.write('批量编辑考核指标（可直接修改单元格，在末尾添加行，选中行后删除）:')
+    key = f"indicator_grid_{template_id}"
+    edited = st.data_editor(
+        [indicator._asdict() for indicator in indicators],
+        key=key,
+        num_rows='dynamic',
+        hide_index=True,
+        column_order=list(GRID_COLUMNS),
+        column_config={
+            'sequence_number': st.column_config.NumberColumn('序号', min_value=1, step=1),
+            'category': st.column_config.TextColumn('指标分类'),
+            'name': st.column_config.TextColumn('指标名称', required=True),
+            'description': st.column_config.TextColumn('指标解释'),
+            'evaluation_criteria': st.column_config.TextColumn('评价标准'),
+            'weight': st.column_config.NumberColumn('指标权重(%)', min_value=0.0, max_value=100.0, required=True),
+        },
+    )
+    weight_sum = round(sum(row.get('weight') or 0 for row in edited), 2)
+    st.info(f"修改后权重总和: {weight_sum:g}% / 100%")
+
+    col1_btn, col2_btn = st.columns(2)
+    with col1_btn:
+        if st.button('保存修改', key=f"save_indicator_grid_{template_id}"):
+            changes = _indicator_changes(indicators, st.session_state.get(key, {}))
+            if changes is None:
+                st.warning('请填写指标名称和权重')
+            elif not any(changes) or apply_indicator_changes(template_id, *changes):
+                st.success('指标修改成功')
+                del st.session_state['bulk_editing_template']
+                st.rerun()
+    with col2_btn:
+        st.button('取消修改', key=f"cancel_indicator_grid_{template_id}",
+                  on_click=_set_bulk_editing_template, args=(None,))
+
+# 打开编辑指标表单（按钮回调）：只重跑右侧表单区域，清除上一次编辑残留的输入
+def _open_indicator_form(indicator):
+    for key in INDICATOR_INPUT_KEYS:
+        st.session_state.pop(key, None)
+    st.session_state.pop('editing_template', None)
+    st.session_state['editing_indicator'] = indicator._asdict()
+    st.rerun(['template_forms'])
+
+# 打开添加指标表单（按钮回调）
+def _open_add_indicator_form(template_id):
+    st.session_state.pop('editing_indicator', None)
+    st.session_state['editing_template'] = template_id
+    st.rerun(['template_forms'])
+
+# 打开编辑模板表单（按钮回调）
+def _open_template_form(template):
+    for key in ('edit_template_name', 'edit_template_desc'):
+        st.session_state.pop(key, None)
+    st.session_state['editing_template_info'] = {
+        'template_id': template.template_id,
+        'template_name': template.template_name,
+        'description': template.description
+    }
+    st.rerun(['template_forms'])
+
+# 关闭表单（按钮回调，表单所在的区域随后重跑）
+def _close_form(state_key):
+    st.session_state.pop(state_key, None)
+
+# 搜索结果最多显示的指标数
+SEARCH_LIMIT = 50
+# 搜索结果表格的列标题
+SEARCH_COLUMNS = {
+    'template_name': '模板',
+    'version': '版本',
+    'category': '分类',
+    'name': '指标名称',
+    'weight': '权重',
+    'snippet': '匹配内容',
+}
+
+# 考核模板管理页面：指标搜索、模板列表、每个模板的指标和右侧的表单分别是独立重跑的 fragment
+# 只影响一个区域的操作（搜索、展开指标、打开或关闭表单、筛选、翻页）只重跑该区域；写入数据后仍重跑整个页面
 def template_management_page():
     st.title('考核模板')
     
@@ -10,158 +153,242 @@ def template_management_page():
     col1, col2 = st.columns([2, 1])
     
     with col1:
-        st.subheader('考核模板列表')
+        _indicator_search()
+        _template_list()
+    
+    with col2:
+        _template_forms()
+
+# 在所有模板的最新版本中搜索指标（名称、指标解释、评价标准）和模板，复用已有的指标
+@st.fragment(key='indicator_search')
+@query_trace.traced_fragment('考核模板/指标搜索')
+def _indicator_search():
+    query = st.text_input('搜索指标和模板', key='indicator_search_query',
+                          placeholder='输入关键词，多个关键词用空格分隔')
+    if not query.strip():
+        return
+    templates = db.search_templates(query)
+    if templates:
+        st.caption('匹配的模板: ' + '，'.join(
+            f"{template.template_name}（v{template.version}）" for template in templates))
+    hits = db.search_indicators(query, SEARCH_LIMIT)
+    if not hits:
+        st.info('没有找到匹配的指标')
+        return
+    if len(hits) >= SEARCH_LIMIT:
+        st.caption(f'只显示最匹配的 {SEARCH_LIMIT} 条指标，可以输入更多关键词缩小范围')
+    else:
+        st.caption(f'找到 {len(hits)} 条匹配的指标')
+    st.dataframe(
+        [dict(hit._asdict(), snippet=hit.snippet or hit.name) for hit in hits],
+        hide_index=True,
+        column_order=list(SEARCH_COLUMNS),
+        column_config=SEARCH_COLUMNS,
+    )
+
+# 模板列表（筛选、分页和各模板的操作按钮）
+@st.fragment(key='template_list')
+@query_trace.traced_fragment('考核模板/模板列表')
+def _template_list():
+    st.subheader('考核模板列表')
+    
+    # 添加搜索和筛选功能
+    with st.container():
+        st.subheader('筛选条件')
+        filter_col1, filter_col2 = st.columns(2)
+        with filter_col1:
+            search_name = st.text_input('按模板名称搜索', key='template_search_name')
+        with filter_col2:
+            filter_date = st.selectbox('按创建时间筛选', ['全部', '最近一周', '最近一个月', '最近三个月', '自定义'], key='template_filter_date')
         
-        # 添加搜索和筛选功能
-        with st.container():
-            st.subheader('筛选条件')
-            filter_col1, filter_col2 = st.columns(2)
-            with filter_col1:
-                search_name = st.text_input('按模板名称搜索', key='template_search_name')
-            with filter_col2:
-                filter_date = st.selectbox('按创建时间筛选', ['全部', '最近一周', '最近一个月', '最近三个月'], key='template_filter_date')
+        start_date = end_date = None
+        if filter_date == '自定义':
+            date_range = st.date_input('创建日期范围', value=(), key='template_date_range')
+            if len(date_range) > 0:
+                start_date = date_range[0]
+            if len(date_range) > 1:
+                end_date = date_range[1]
+    
+    # 获取筛选后的模板列表（分页）
+    total_templates = db.count_templates(search_name, filter_date, start_date, end_date)
+    page_count = max(1, (total_templates + TEMPLATE_PAGE_SIZE - 1) // TEMPLATE_PAGE_SIZE)
+    page = st.number_input(f'页码（共 {page_count} 页，{total_templates} 个模板）', min_value=1, max_value=page_count, value=1, key='template_page')
+    templates = db.get_all_templates(search_name, filter_date, start_date, end_date,
+                                     limit=TEMPLATE_PAGE_SIZE, offset=(page - 1) * TEMPLATE_PAGE_SIZE)
         
-        # 获取筛选后的模板列表
-        templates_df = db.get_all_templates(search_name, filter_date)
+    # 一次查询取出本页所有展开模板的指标
+    viewing_templates = st.session_state.get('viewing_templates', set())
+    visible_ids = [template_id for template_id in (template.template_id for template in templates) if template_id in viewing_templates]
+    indicators_by_template = db.get_indicators_for_templates(visible_ids)
+    
+    for template in templates:
+        template_id = template.template_id
+        # 已发布的版本只读，修改时先创建新版本
+        published = template.published_at is not None
+        with st.container():
+            cols = st.columns([2, 1, 1, 1, 1, 1])
+            with cols[0]:
+                st.write(f"📋 {template.template_name}（v{template.version}，{'已发布' if published else '草稿'}）")
+                st.caption(f"描述: {template.description}")
+                # 显示权重完成度（来自模板汇总表）
+                weight_sum = float(template.weight_sum)
+                st.progress(min(weight_sum, 100.0) / 100, text=f"{template.indicator_count} 个指标，权重 {weight_sum:g}% / 100%")
+            with cols[1]:
+                st.button('收起指标' if template_id in viewing_templates else '查看指标',
+                          key=f"view_indicator_{template_id}",
+                          on_click=_toggle_viewing_template, args=(template_id,))
+            with cols[2]:
+                if published:
+                    if st.button('新版本', key=f"new_version_{template_id}"):
+                        if clone_template(template_id):
+                            st.success('已创建新版本')
+                            st.rerun()
+                else:
+                    st.button('编辑', key=f"edit_template_{template_id}",
+                              on_click=_open_template_form, args=(template,))
+            with cols[3]:
+                if not published and st.button('发布', key=f"publish_template_{template_id}"):
+                    if publish_template(template_id):
+                        st.success('模板已发布')
+                        st.rerun()
+            with cols[4]:
+                if st.button('复制', key=f"copy_template_{template_id}"):
+                    if clone_template(template_id, f'{template.template_name} 副本'):
+                        st.success('模板复制成功')
+                        st.rerun()
+            with cols[5]:
+                if st.button('删除', key=f"delete_template_{template_id}"):
+                    if delete_template(template_id):
+                        st.success('模板删除成功')
+                        st.rerun()
+            st.divider()
             
-        for _, template in templates_df.iterrows():
+            # 显示模板的考核指标
+            if template_id in viewing_templates:
+                _indicator_panel(template_id, published, indicators_by_template.get(template_id) or [], weight_sum)
+    
+    if not templates:
+        st.info('暂无考核模板')
+
+# 模板的指标列表（每个展开的模板一个 fragment，批量编辑表格中的修改只重跑这一块）
+# 重跑时沿用列表查询到的指标；指标写入后重跑整个页面
+@st.fragment
+@query_trace.traced_fragment('考核模板/指标')
+def _indicator_panel(template_id, published, indicators, weight_sum):
+    if not published and st.session_state.get('bulk_editing_template') == template_id:
+        indicator_grid(template_id, indicators)
+    elif indicators:
+        st.write('考核指标:')
+        
+        for indicator in indicators:
             with st.container():
-                cols = st.columns([2, 1, 1, 1])
-                with cols[0]:
-                    st.write(f"📋 {template['template_name']}")
-                    st.caption(f"描述: {template['description']}")
-                with cols[1]:
-                    if st.button('查看指标', key=f"view_indicator_{template['template_id']}"):
-                        st.session_state['viewing_template'] = template['template_id']
-                with cols[2]:
-                    if st.button('编辑', key=f"edit_template_{template['template_id']}"):
-                        st.session_state['editing_template_info'] = {
-                            'template_id': template['template_id'],
-                            'template_name': template['template_name'],
-                            'description': template['description']
-                        }
-                with cols[3]:
-                    if st.button('删除', key=f"delete_template_{template['template_id']}"):
-                        if delete_template(template['template_id']):
-                            st.success('模板删除成功')
-                            st.rerun()
+                ind_cols = st.columns([1, 2, 2, 1])
+                with ind_cols[0]:
+                    st.write(f"序号: {indicator.sequence_number}")
+                    st.write(f"分类: {indicator.category}")
+                with ind_cols[1]:
+                    st.write(f"指标名称: {indicator.name}")
+                    st.write(f"指标解释: {indicator.description}")
+                with ind_cols[2]:
+                    st.write(f"评价标准: {indicator.evaluation_criteria}")
+                with ind_cols[3]:
+                    st.write(f"权重: {indicator.weight}%")
+                    # 使用水平排列的按钮而不是嵌套列（已发布的版本不能修改指标）
+                    if not published:
+                        st.button('编辑', key=f"edit_indicator_{indicator.indicator_id}",
+                                  on_click=_open_indicator_form, args=(indicator,))
+                        if st.button('删除', key=f"delete_indicator_{indicator.indicator_id}"):
+                            if delete_indicator(indicator.indicator_id):
+                                st.success('指标删除成功')
+                                st.rerun()
                 st.divider()
-                
-                # 显示模板的考核指标
-                if 'viewing_template' in st.session_state and st.session_state['viewing_template'] == template['template_id']:
-                    indicators_df = db.get_template_indicators(template['template_id'])
-                    
-                    if not indicators_df.empty:
-                        st.write('考核指标:')
-                        # 计算权重总和
-                        total_weight = indicators_df['weight'].sum()
-                        
-                        for _, indicator in indicators_df.iterrows():
-                            with st.container():
-                                ind_cols = st.columns([1, 2, 2, 1])
-                                with ind_cols[0]:
-                                    st.write(f"序号: {indicator['sequence_number']}")
-                                    st.write(f"分类: {indicator['category']}")
-                                with ind_cols[1]:
-                                    st.write(f"指标名称: {indicator['name']}")
-                                    st.write(f"指标解释: {indicator['description']}")
-                                with ind_cols[2]:
-                                    st.write(f"评价标准: {indicator['evaluation_criteria']}")
-                                with ind_cols[3]:
-                                    st.write(f"权重: {indicator['weight']}%")
-                                    # 使用水平排列的按钮而不是嵌套列
-                                    if st.button('编辑', key=f"edit_indicator_{indicator['indicator_id']}"):
-                                        st.session_state['editing_indicator'] = indicator.to_dict()
-                                    if st.button('删除', key=f"delete_indicator_{indicator['indicator_id']}"):
-                                        if delete_indicator(indicator['indicator_id']):
-                                            st.success('指标删除成功')
-                                            st.rerun()
-                                st.divider()
-                        
-                        # 在指标列表下方显示权重总和
-                        st.info(f"当前模板权重总和: {total_weight}% / 100%")
-                    
-                    if st.button('添加指标', key=f"add_indicator_{template['template_id']}"):
-                        st.session_state['editing_template'] = template['template_id']
-        
-        if templates_df.empty:
-            st.info('暂无考核模板')
+
+        # 在指标列表下方显示权重总和
+        st.info(f"当前模板权重总和: {weight_sum:g}% / 100%")
+
+    if not published and st.session_state.get('bulk_editing_template') != template_id:
+        st.button('添加指标', key=f"add_indicator_{template_id}",
+                  on_click=_open_add_indicator_form, args=(template_id,))
+        st.button('批量编辑', key=f"bulk_edit_{template_id}",
+                  on_click=_set_bulk_editing_template, args=(template_id,))
+
+# 右侧的新增模板、批量导入导出和编辑表单
+@st.fragment(key='template_forms')
+@query_trace.traced_fragment('考核模板/表单')
+def _template_forms():
+    st.subheader('新增考核模板')
+    new_template_name = st.text_input('模板名称', key='new_template_name')
+    new_template_desc = st.text_area('模板描述', key='new_template_desc')
     
-    with col2:
-        st.subheader('新增考核模板')
-        new_template_name = st.text_input('模板名称', key='new_template_name')
-        new_template_desc = st.text_area('模板描述', key='new_template_desc')
-        
-        if st.button('创建模板'):
-            if new_template_name:
-                if create_template(new_template_name, new_template_desc):
-                    st.success('模板创建成功')
-                    st.rerun()
-            else:
-                st.warning('请填写模板名称')
+    if st.button('创建模板'):
+        if new_template_name:
+            if create_template(new_template_name, new_template_desc):
+                st.success('模板创建成功')
+                st.rerun()
+        else:
+            st.warning('请填写模板名称')
+    
+    # 批量导入和导出
+    template_import.template_import_section()
+    export.export_section('templates')
+    
+    # 编辑模板表单
+    edit_template_form()
+    
+    # 编辑指标表单
+    if 'editing_indicator' in st.session_state:
+        st.subheader('编辑考核指标')
+        indicator = st.session_state['editing_indicator']
         
-        # 编辑指标表单
-        if 'editing_indicator' in st.session_state:
-            st.subheader('编辑考核指标')
-            indicator = st.session_state['editing_indicator']
-            
-            edit_indicator_seq = st.number_input('序号', min_value=1, value=int(indicator['sequence_number']), key='edit_indicator_seq')
-            edit_indicator_category = st.text_input('指标分类', value=indicator['category'], key='edit_indicator_category')
-            edit_indicator_name = st.text_input('指标名称', value=indicator['name'], key='edit_indicator_name')
-            edit_indicator_desc = st.text_area('指标解释', value=indicator['description'], key='edit_indicator_desc')
-            edit_indicator_criteria = st.text_area('评价标准', value=indicator['evaluation_criteria'], key='edit_indicator_criteria')
-            edit_indicator_weight = st.number_input('指标权重(%)', min_value=0.0, max_value=100.0, value=float(indicator['weight']), key='edit_indicator_weight')
-            
-            col1_btn, col2_btn = st.columns(2)
-            with col1_btn:
-                if st.button('保存修改', key='save_indicator_edit'):
-                    if edit_indicator_name and edit_indicator_weight:
-                        if update_indicator(indicator['indicator_id'], edit_indicator_seq, 
-                                        edit_indicator_category, edit_indicator_name, edit_indicator_desc,
-                                        edit_indicator_criteria, edit_indicator_weight, indicator['template_id']):
-                            st.success('指标修改成功')
-                            del st.session_state['editing_indicator']
-                            st.rerun()
-                    else:
-                        st.warning('请填写指标名称和权重')
-            
-            with col2_btn:
-                if st.button('取消修改', key='cancel_indicator_edit'):
-                    del st.session_state['editing_indicator']
-                    st.rerun()
+        edit_indicator_seq = st.number_input('序号', min_value=1, value=int(indicator['sequence_number']), key='edit_indicator_seq')
+        edit_indicator_category = st.text_input('指标分类', value=indicator['category'], key='edit_indicator_category')
+        edit_indicator_name = st.text_input('指标名称', value=indicator['name'], key='edit_indicator_name')
+        edit_indicator_desc = st.text_area('指标解释', value=indicator['description'], key='edit_indicator_desc')
+        edit_indicator_criteria = st.text_area('评价标准', value=indicator['evaluation_criteria'], key='edit_indicator_criteria')
+        edit_indicator_weight = st.number_input('指标权重(%)', min_value=0.0, max_value=100.0, value=float(indicator['weight']), key='edit_indicator_weight')
         
-        # 添加指标表单
-        elif 'editing_template' in st.session_state:
-            st.subheader('添加考核指标')
-            
-            # 获取当前模板已有的最大序号
-            template_id = st.session_state['editing_template']
-            indicators_df = db.get_template_indicators(template_id)
-            
-            # 计算下一个序号（最大序号+1）
-            if not indicators_df.empty:
-                next_seq = indicators_df['sequence_number'].max() + 1
-            else:
-                next_seq = 1
-                
-            # 允许用户手动修改序号，但默认为自动计算的序号
-            new_indicator_seq = st.number_input('序号', min_value=1, value=next_seq)
-            new_indicator_category = st.text_input('指标分类')
-            new_indicator_name = st.text_input('指标名称')
-            new_indicator_desc = st.text_area('指标解释')
-            new_indicator_criteria = st.text_area('评价标准')
-            new_indicator_weight = st.number_input('指标权重(%)', min_value=0.0, max_value=100.0, value=0.0)
-            
-            if st.button('保存指标'):
-                if new_indicator_name and new_indicator_weight:
-                    if add_indicator(st.session_state['editing_template'], new_indicator_seq, 
-                                    new_indicator_category, new_indicator_name, new_indicator_desc,
-                                    new_indicator_criteria, new_indicator_weight):
-                        st.success('指标添加成功')
-                        del st.session_state['editing_template']
+        col1_btn, col2_btn = st.columns(2)
+        with col1_btn:
+            if st.button('保存修改', key='save_indicator_edit'):
+                if edit_indicator_name and edit_indicator_weight:
+                    if update_indicator(indicator['indicator_id'], edit_indicator_seq, 
+                                    edit_indicator_category, edit_indicator_name, edit_indicator_desc,
+                                    edit_indicator_criteria, edit_indicator_weight):
+                        st.success('指标修改成功')
+                        del st.session_state['editing_indicator']
                         st.rerun()
                 else:
                     st.warning('请填写指标名称和权重')
+        
+        with col2_btn:
+            st.button('取消修改', key='cancel_indicator_edit', on_click=_close_form, args=('editing_indicator',))
+    
+    # 添加指标表单
+    elif 'editing_template' in st.session_state:
+        st.subheader('添加考核指标')
+        
+        # 计算下一个序号（模板汇总表中的最大序号+1）
+        template_id = st.session_state['editing_template']
+        next_seq = db.get_template_summary(template_id).max_sequence + 1
+            
+        # 允许用户手动修改序号，但默认为自动计算的序号
+        new_indicator_seq = st.number_input('序号', min_value=1, value=next_seq)
+        new_indicator_category = st.text_input('指标分类')
+        new_indicator_name = st.text_input('指标名称')
+        new_indicator_desc = st.text_area('指标解释')
+        new_indicator_criteria = st.text_area('评价标准')
+        new_indicator_weight = st.number_input('指标权重(%)', min_value=0.0, max_value=100.0, value=0.0)
+        
+        if st.button('保存指标'):
+            if new_indicator_name and new_indicator_weight:
+                if add_indicator(st.session_state['editing_template'], new_indicator_seq, 
+                                new_indicator_category, new_indicator_name, new_indicator_desc,
+                                new_indicator_criteria, new_indicator_weight):
+                    st.success('指标添加成功')
+                    del st.session_state['editing_template']
+                    st.rerun()
+            else:
+                st.warning('请填写指标名称和权重')
 
 # 编辑模板表单
 def edit_template_form():
@@ -170,7 +397,7 @@ def edit_template_form():
         edit_template_name = st.text_input('模板名称', value=st.session_state['editing_template_info']['template_name'], key='edit_template_name')
         edit_template_desc = st.text_area('模板描述', value=st.session_state['editing_template_info']['description'], key='edit_template_desc')
         
-        if st.button('保存修改'):
+        if st.button('保存修改', key='save_template_edit'):
             if edit_template_name:
                 if update_template(st.session_state['editing_template_info']['template_id'], edit_template_name, edit_template_desc):
                     st.success('模板修改成功')
@@ -179,19 +406,12 @@ def edit_template_form():
             else:
                 st.warning('请填写模板名称')
         
-        if st.button('取消修改'):
-            del st.session_state['editing_template_info']
-            st.rerun()
+        st.button('取消修改', key='cancel_template_edit', on_click=_close_form, args=('editing_template_info',))
 
 # 创建模板
 def create_template(template_name, description):
     try:
-        conn = db.get_db_connection()
-        c = conn.cursor()
-        c.execute('INSERT INTO kpi_templates (template_name, description) VALUES (?, ?)',
-                (template_name, description))
-        conn.commit()
-        conn.close()
+        repository.create_template(template_name, description)
         return True
     except Exception as e:
         st.error(f'创建模板失败: {str(e)}')
@@ -200,13 +420,11 @@ def create_template(template_name, description):
 # 更新模板
 def update_template(template_id, template_name, description):
     try:
-        conn = db.get_db_connection()
-        c = conn.cursor()
-        c.execute('UPDATE kpi_templates SET template_name = ?, description = ? WHERE template_id = ?',
-                (template_name, description, template_id))
-        conn.commit()
-        conn.close()
+        repository.update_template(template_id, template_name, description)
         return True
+    except repository.TemplatePublishedError:
+        st.error(PUBLISHED_MESSAGE)
+        return False
     except Exception as e:
         st.error(f'修改模板失败: {str(e)}')
         return False
@@ -214,99 +432,86 @@ def update_template(template_id, template_name, description):
 # 删除模板
 def delete_template(template_id):
     try:
-        conn = db.get_db_connection()
-        c = conn.cursor()
-        c.execute('DELETE FROM kpi_indicators WHERE template_id = ?', (template_id,))
-        c.execute('DELETE FROM kpi_templates WHERE template_id = ?', (template_id,))
-        conn.commit()
-        conn.close()
+        repository.delete_template(template_id)
         return True
+    except repository.TemplatePublishedError:
+        st.error('该模板版本已有考核结果，不能删除')
+        return False
     except Exception as e:
         st.error(f'删除模板失败: {str(e)}')
         return False
 
+# 复制模板：template_name 为 None 时创建同一模板的新版本，否则创建新模板
+def clone_template(template_id, template_name=None):
+    try:
+        repository.clone_template(template_id, template_name)
+        return True
+    except Exception as e:
+        st.error(f'复制模板失败: {str(e)}')
+        return False
+
+# 发布模板版本
+def publish_template(template_id):
+    try:
+        repository.publish_template(template_id)
+        return True
+    except Exception as e:
+        st.error(f'发布模板失败: {str(e)}')
+        return False
+
 # 添加指标
 def add_indicator(template_id, sequence_number, category, name, description, evaluation_criteria, weight):
     try:
-        conn = db.get_db_connection()
-        c = conn.cursor()
-        
-        # 检查权重总和是否超过100%
-        current_weight_sum = pd.read_sql_query(
-            'SELECT SUM(weight) as total_weight FROM kpi_indicators WHERE template_id = ?',
-            conn,
-            params=(template_id,)
-        )['total_weight'].iloc[0] or 0
-        
-        if current_weight_sum + weight <= 100:
-            c.execute('''
-                INSERT INTO kpi_indicators 
-                (template_id, sequence_number, category, name, description, evaluation_criteria, weight)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (template_id, sequence_number, category, name, description, evaluation_criteria, weight))
-            conn.commit()
-            conn.close()
-            return True
-        else:
-            st.error('指标权重总和不能超过100%')
-            conn.close()
-            return False
+        repository.add_indicator(template_id, sequence_number, category, name, description, evaluation_criteria, weight)
+        return True
+    except repository.WeightBudgetExceededError:
+        st.error('指标权重总和不能超过100%')
+        return False
+    except repository.TemplatePublishedError:
+        st.error(PUBLISHED_MESSAGE)
+        return False
     except Exception as e:
         st.error(f'添加指标失败: {str(e)}')
         return False
 
 # 更新指标
-def update_indicator(indicator_id, sequence_number, category, name, description, evaluation_criteria, weight, template_id):
+def update_indicator(indicator_id, sequence_number, category, name, description, evaluation_criteria, weight):
     try:
-        conn = db.get_db_connection()
-        c = conn.cursor()
-        
-        # 获取当前指标的权重
-        current_indicator = pd.read_sql_query(
-            'SELECT weight FROM kpi_indicators WHERE indicator_id = ?',
-            conn,
-            params=(indicator_id,)
-        )
-        current_weight = current_indicator['weight'].iloc[0] if not current_indicator.empty else 0
-        
-        # 计算除当前指标外的权重总和
-        other_weight_sum = pd.read_sql_query(
-            'SELECT SUM(weight) as total_weight FROM kpi_indicators WHERE template_id = ? AND indicator_id != ?',
-            conn,
-            params=(template_id, indicator_id)
-        )['total_weight'].iloc[0] or 0
-        
-        # 检查更新后的权重总和是否超过100%
-        if other_weight_sum + weight <= 100:
-            c.execute('''
-                UPDATE kpi_indicators 
-                SET sequence_number = ?, category = ?, name = ?, description = ?, 
-                    evaluation_criteria = ?, weight = ?
-                WHERE indicator_id = ?
-            ''', (sequence_number, category, name, description, evaluation_criteria, weight, indicator_id))
-            conn.commit()
-            conn.close()
-            return True
-        else:
-            st.error('指标权重总和不能超过100%')
-            conn.close()
-            return False
+        repository.update_indicator(indicator_id, sequence_number, category, name, description, evaluation_criteria, weight)
+        return True
+    except repository.WeightBudgetExceededError:
+        st.error('指标权重总和不能超过100%')
+        return False
+    except repository.TemplatePublishedError:
+        st.error(PUBLISHED_MESSAGE)
+        return False
     except Exception as e:
         st.error(f'更新指标失败: {str(e)}')
         return False
 
+# 批量修改指标（表格编辑的变更集），在一个事务中提交
+def apply_indicator_changes(template_id, inserts, updates, deletes):
+    try:
+        repository.apply_indicator_changes(template_id, inserts, updates, deletes)
+        return True
+    except repository.WeightBudgetExceededError:
+        st.error('指标权重总和不能超过100%')
+        return False
+    except repository.TemplatePublishedError:
+        st.error(PUBLISHED_MESSAGE)
+        return False
+    except Exception as e:
+        st.error(f'保存指标失败: {str(e)}')
+        return False
+
 # 删除指标
 def delete_indicator(indicator_id):
     try:
-        conn = db.get_db_connection()
-        c = conn.cursor()
-        c.execute('DELETE FROM kpi_indicators WHERE indicator_id = ?', (indicator_id,))
-        conn.commit()
-        conn.close()
+        repository.delete_indicator(indicator_id)
         return True
+    except repository.TemplatePublishedError:
+        st.error(PUBLISHED_MESSAGE)
+        return False
     except Exception as e:
         st.error(f'删除指标失败: {str(e)}')
         return False
-    except Exception as e:
-        st.error(f'添加指标失败: {str(e)}')
-        return False
\ No newline at end of file
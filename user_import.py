@@ -0,0 +1,179 @@
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import streamlit as st
+import db
+import passwords
+import repository
+import template_import
+
+# 导入文件的列名（中文表头或字段名均可）
+USER_IMPORT_COLUMNS = {
+    '用户名': 'username',
+    '姓名': 'name',
+    '密码': 'password',
+    '角色': 'role',
+    '部门': 'department',
+    '岗位': 'position',
+    '工号': 'employee_id',
+}
+
+# 每批提交给进程池的密码数
+HASH_CHUNK_SIZE = 64
+
+# 在工作进程中计算密码哈希（bcrypt，轮数取自配置）
+def _hash_passwords(plain_passwords):
+    return [passwords.hash_password(password) for password in plain_passwords]
+
+# 使用进程池并行计算密码哈希，结果顺序与输入一致
+def hash_passwords(plain_passwords, workers=None):
+    plain_passwords = list(plain_passwords)
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(plain_passwords) <= HASH_CHUNK_SIZE:
+        return _hash_passwords(plain_passwords)
+    chunks = [plain_passwords[start:start + HASH_CHUNK_SIZE] for start in range(0, len(plain_passwords), HASH_CHUNK_SIZE)]
+    # 使用 spawn 启动工作进程，避免 fork 复制 Streamlit 服务进程中的线程和连接
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+        return [hashed for chunk in executor.map(_hash_passwords, chunks) for hashed in chunk]
+
+# 按批查询找出已存在的用户名（按小写比较，与登录时一致）
+def _existing_usernames(conn, usernames):
+    names = [username.lower() for username in usernames]
+    existing = set()
+    for start in range(0, len(names), 500):
+        chunk = names[start:start + 500]
+        placeholders = ', '.join('?' * len(chunk))
+        existing.update(row[0] for row in conn.execute(
+            f'SELECT lower(username) FROM users WHERE lower(username) IN ({placeholders})', chunk
+        ))
+    return existing
+
+# 在写线程中写入已哈希密码的用户，返回实际写入的记录
+# 哈希期间可能有其他会话新增了同名用户，写入前再检查一次
+def _insert_users(conn, users, hashed_passwords, errors):
+    existing = _existing_usernames(conn, [user[1] for user in users])
+    for user in users:
+        if user[1].lower() in existing:
+            errors.append({'row': user[0], 'username': user[1], 'error': '用户名已存在'})
+    records = [
+        (username, name, hashed, role, department, position, employee_id)
+        for (_, username, name, _, role, department, position, employee_id), hashed in zip(users, hashed_passwords)
+        if username.lower() not in existing
+    ]
+    conn.executemany(
+        'INSERT INTO users (username, name, password, role, department, position, employee_id) VALUES (?, ?, ?, ?, ?, ?, ?)',
+        records
+    )
+    return records
+
+# 批量导入用户：校验、去重、并行哈希后在一个事务中写入
+# rows 为 (行号, 字段字典) 序列，也可以直接传入字段字典列表
+def import_users(rows, workers=None, dry_run=False):
+    errors = []
+    users = []
+    seen = set()
+    for item in rows:
+        row_number, record = (None, item) if isinstance(item, dict) else item
+        if row_number is None:
+            row_number = len(users) + len(errors) + 1
+        username = str(record.get('username') or '').strip()
+        name = str(record.get('name') or '').strip()
+        password = str(record.get('password') or '')
+        role = str(record.get('role') or 'user').strip()
+        if not username or not name or not password:
+            errors.append({'row': row_number, 'username': username, 'error': '请填写必要信息（用户名、姓名、密码）'})
+            continue
+        if role not in ('user', 'admin'):
+            errors.append({'row': row_number, 'username': username, 'error': f'角色无效: {role}'})
+            continue
+        if username.lower() in seen:
+            errors.append({'row': row_number, 'username': username, 'error': '文件中用户名重复'})
+            continue
+        seen.add(username.lower())
+        users.append((row_number, username, name, password, role,
+                      record.get('department') or '', record.get('position') or '', record.get('employee_id') or ''))
+
+    report = {'users': 0, 'errors': errors, 'dry_run': dry_run, 'hash_seconds': 0.0, 'insert_seconds': 0.0}
+    if users:
+        with db.get_db_connection() as conn:
+            existing = _existing_usernames(conn, [user[1] for user in users])
+        for user in users:
+            if user[1].lower() in existing:
+                errors.append({'row': user[0], 'username': user[1], 'error': '用户名已存在'})
+        users = [user for user in users if user[1].lower() not in existing]
+
+    report['users'] = len(users)
+    if dry_run or not users:
+        errors.sort(key=lambda error: error['row'])
+        return report
+
+    started = time.perf_counter()
+    hashed_passwords = hash_passwords([user[3] for user in users], workers)
+    report['hash_seconds'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    records = repository.write(_insert_users, users, hashed_passwords, errors)
+    report['insert_seconds'] = time.perf_counter() - started
+    report['users'] = len(records)
+    errors.sort(key=lambda error: error['row'])
+    return report
+
+# 吞吐量描述
+def _throughput(report):
+    total = report['hash_seconds'] + report['insert_seconds']
+    rate = report['users'] / total if total else 0
+    return (f"哈希 {report['hash_seconds']:.2f} 秒，写入 {report['insert_seconds']:.2f} 秒，"
+            f"{rate:.1f} 用户/秒")
+
+# 批量导入页面区块
+def user_import_section():
+    with st.expander('批量导入用户'):
+        st.caption('表头: ' + ', '.join(USER_IMPORT_COLUMNS))
+        uploaded_file = st.file_uploader('选择CSV或Excel文件', type=['csv', 'xlsx'], key='user_import_file')
+        dry_run = st.checkbox('仅校验，不写入', value=True, key='user_import_dry_run')
+
+        if st.button('开始导入', key='user_import_btn'):
+            if uploaded_file is None:
+                st.warning('请先选择文件')
+                return
+            try:
+                with st.spinner('正在导入用户...'):
+                    report = import_users(template_import.read_rows(uploaded_file, uploaded_file.name, USER_IMPORT_COLUMNS),
+                                          dry_run=dry_run)
+            except Exception as e:
+                st.error(f'导入失败: {str(e)}')
+                return
+
+            if dry_run:
+                st.success(f"校验通过: 可导入用户 {report['users']} 个")
+            else:
+                st.success(f"已导入用户 {report['users']} 个（{_throughput(report)}）")
+            if report['errors']:
+                st.warning(f"{len(report['errors'])} 行未导入")
+                st.dataframe(report['errors'], hide_index=True,
+                             column_config={'row': '行号', 'username': '用户名', 'error': '错误'})
+
+# 命令行入口：从 HR 导出的文件批量同步用户
+def main():
+    parser = argparse.ArgumentParser(description='批量导入用户')
+    parser.add_argument('file', help='CSV或Excel文件')
+    parser.add_argument('--db', default=repository.DB_PATH, help='数据库文件路径')
+    parser.add_argument('--workers', type=int, help='哈希进程数，默认为CPU核数')
+    parser.add_argument('--dry-run', action='store_true', help='仅校验，不写入')
+    args = parser.parse_args()
+
+    repository.DB_PATH = args.db
+    with open(args.file, 'rb') as file:
+        report = import_users(template_import.read_rows(file, args.file, USER_IMPORT_COLUMNS),
+                              workers=args.workers, dry_run=args.dry_run)
+    for error in report['errors']:
+        print(f"第 {error['row']} 行 {error['username']}: {error['error']}")
+    if args.dry_run:
+        print(f"校验通过: 可导入用户 {report['users']} 个")
+    else:
+        print(f"已导入用户 {report['users']} 个（{_throughput(report)}）")
+
+if __name__ == '__main__':
+    main()
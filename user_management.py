@@ -1,8 +1,73 @@
 import streamlit as st
-import pandas as pd
 import db
+import export
+import passwords
+import query_trace
+import user_import
 
-# 用户管理页面
+# 用户列表每页显示的用户数
+USER_PAGE_SIZE = 50
+
+# 用户表格的列标题
+USER_COLUMNS = {
+    'username': '用户名',
+    'name': '姓名',
+    'role': '角色',
+    'department': '部门',
+    'position': '职位',
+    'employee_id': '工号',
+}
+
+# 编辑表单中输入框的 key
+EDIT_INPUT_KEYS = ['edit_name_input', 'edit_department_input', 'edit_position_input',
+                   'edit_employee_id_input', 'edit_role_input', 'edit_password_input']
+
+# 退出编辑状态并清除表格中的选中行
+def _clear_user_selection():
+    del st.session_state['editing_user']
+    st.session_state['user_table_version'] = st.session_state.get('user_table_version', 0) + 1
+
+# 取消编辑（按钮回调）：清除选中行后重跑用户列表和右侧表单
+def _cancel_edit():
+    _clear_user_selection()
+    st.rerun(['user_list', 'user_forms'])
+
+# 选中或取消选中表格中的用户（表格回调）：只重跑右侧的编辑表单
+def _select_user(users, table_key):
+    selected_rows = [i for i in st.session_state[table_key]['selection']['rows'] if i < len(users)]
+    if selected_rows:
+        user = users[selected_rows[0]]
+        if st.session_state.get('editing_user') != user.username:
+            # 切换到另一个用户时清除编辑表单中残留的输入
+            for key in EDIT_INPUT_KEYS:
+                st.session_state.pop(key, None)
+            st.session_state['editing_user'] = user.username
+            st.session_state['edit_name'] = user.name
+            st.session_state['edit_department'] = user.department
+            st.session_state['edit_position'] = user.position
+            st.session_state['edit_employee_id'] = user.employee_id
+            st.session_state['edit_role'] = user.role
+    elif 'editing_user' in st.session_state:
+        # 取消选中行时退出编辑状态
+        del st.session_state['editing_user']
+    st.rerun(['user_forms'])
+
+# 显示后台密码哈希任务的状态（每秒刷新，只重跑这一块）
+@st.fragment(run_every=1)
+def _password_job_status():
+    for username in list(st.session_state.get('password_jobs', [])):
+        status = passwords.get_job_status(username)
+        if status == 'pending':
+            st.info(f'用户 {username} 的密码正在后台加密...')
+            continue
+        if status == 'failed':
+            st.error(f'用户 {username} 的密码加密失败，请重新设置')
+        else:
+            st.caption(f'用户 {username} 的密码已生效')
+        st.session_state['password_jobs'].remove(username)
+
+# 用户管理页面：用户列表和右侧的表单是两个独立重跑的 fragment
+# 筛选、翻页只重跑列表，选中用户只重跑表单；写入数据后仍重跑整个页面
 def user_management_page():
     st.title('用户管理')
     
@@ -10,95 +75,109 @@ def user_management_page():
     col1, col2 = st.columns([2, 1])
     
     with col1:
-        # 添加筛选功能到一个容器中
-        with st.container():
-            st.subheader('筛选条件')
-            filter_col1, filter_col2, filter_col3 = st.columns(3)
-            with filter_col1:
-                search_name = st.text_input('按姓名搜索', key='search_name')
-            with filter_col2:
-                conn = db.get_db_connection()
-                departments = pd.read_sql_query('SELECT DISTINCT department FROM users', conn)['department']
-                conn.close()
-                filter_department = st.selectbox('按部门筛选', ['全部'] + list(departments), key='filter_department')
-            with filter_col3:
-                filter_role = st.selectbox('按角色筛选', ['全部', 'admin', 'user'], key='filter_role')
+        _user_list()
+    
+    with col2:
+        _user_forms()
+
+# 用户列表（筛选、分页，选中行后在右侧编辑或删除）
+@st.fragment(key='user_list')
+@query_trace.traced_fragment('用户管理/用户列表')
+def _user_list():
+    # 添加筛选功能到一个容器中
+    with st.container():
+        st.subheader('筛选条件')
+        filter_col1, filter_col2, filter_col3 = st.columns(3)
+        with filter_col1:
+            search_name = st.text_input('按姓名搜索', key='search_name')
+        with filter_col2:
+            departments = db.get_departments()
+            filter_department = st.selectbox('按部门筛选', ['全部'] + list(departments), key='filter_department')
+        with filter_col3:
+            filter_role = st.selectbox('按角色筛选', ['全部', 'admin', 'user'], key='filter_role')
+    
+    # 用户列表
+    st.subheader('用户列表')
+    total_users = db.count_users(search_name, filter_department, filter_role)
+    page_count = max(1, (total_users + USER_PAGE_SIZE - 1) // USER_PAGE_SIZE)
+    page = st.number_input(f'页码（共 {page_count} 页，{total_users} 个用户）', min_value=1, max_value=page_count, value=1, key='user_page')
+    users = db.get_all_users(search_name, filter_department, filter_role,
+                             limit=USER_PAGE_SIZE, offset=(page - 1) * USER_PAGE_SIZE)
+    
+    # 使用单个表格组件展示当前页用户，选中行后在右侧编辑或删除
+    table_key = f"user_table_{st.session_state.get('user_table_version', 0)}"
+    st.dataframe(
+        [user._asdict() for user in users],
+        hide_index=True,
+        column_order=['name', 'department', 'position', 'employee_id', 'role', 'username'],
+        column_config=USER_COLUMNS,
+        on_select=lambda: _select_user(users, table_key),
+        selection_mode='single-row',
+        key=table_key
+    )
+    
+    # 如果没有用户显示提示信息
+    if not users:
+        st.info('没有找到符合条件的用户')
+
+# 右侧的编辑用户、新增用户和批量导入导出
+@st.fragment(key='user_forms')
+@query_trace.traced_fragment('用户管理/表单')
+def _user_forms():
+    if st.session_state.get('password_jobs'):
+        _password_job_status()
+    
+    # 判断是否处于编辑模式
+    if 'editing_user' in st.session_state:
+        # 编辑用户表单
+        st.subheader('编辑用户')
+        edit_name = st.text_input('姓名', value=st.session_state['edit_name'], key='edit_name_input')
+        edit_department = st.text_input('部门', value=st.session_state['edit_department'], key='edit_department_input')
+        edit_position = st.text_input('岗位', value=st.session_state['edit_position'], key='edit_position_input')
+        edit_employee_id = st.text_input('工号', value=st.session_state['edit_employee_id'], key='edit_employee_id_input')
+        edit_role = st.selectbox('角色', ['user', 'admin'], index=0 if st.session_state['edit_role'] == 'user' else 1, key='edit_role_input')
+        edit_password = st.text_input('新密码 (留空不修改)', type='password', key='edit_password_input')
         
-        # 用户列表
-        st.subheader('用户列表')
-        users_df = db.get_all_users(search_name, filter_department, filter_role)
+        col1_btn, col2_btn, col3_btn = st.columns(3)
+        with col1_btn:
+            if st.button('保存修改', key='save_edit_btn'):
+                if db.update_user(st.session_state['editing_user'], edit_name, edit_department, edit_position, edit_employee_id, edit_role, edit_password):
+                    st.success('用户信息更新成功')
+                    if edit_password and edit_password.strip():
+                        st.session_state.setdefault('password_jobs', []).append(st.session_state['editing_user'])
+                    _clear_user_selection()
+                    st.rerun()
         
-        # 使用表格展示用户列表
-        for index, row in users_df.iterrows():
-            with st.container():
-                cols = st.columns([1, 1, 1, 1, 1, 1])
-                with cols[0]:
-                    st.write(f"👤 {row['name']}")
-                with cols[1]:
-                    st.write(f"部门: {row['department']}")
-                with cols[2]:
-                    st.write(f"职位: {row['position']}")
-                with cols[3]:
-                    st.write(f"工号: {row['employee_id']}")
-                with cols[4]:
-                    if st.button('编辑', key=f'edit_user_{row["username"]}_{index}'):
-                        st.session_state['editing_user'] = row['username']
-                        st.session_state['edit_name'] = row['name']
-                        st.session_state['edit_department'] = row['department']
-                        st.session_state['edit_position'] = row['position']
-                        st.session_state['edit_employee_id'] = row['employee_id']
-                        st.session_state['edit_role'] = row['role']
-                with cols[5]:
-                    if row['username'] != 'admin':
-                        if st.button('删除', key=f'delete_{row["username"]}_{index}'):
-                            if db.delete_user(row['username']):
-                                st.success('用户删除成功')
-                                st.rerun()
-            st.divider()
+        with col2_btn:
+            st.button('取消', key='cancel_edit_btn', on_click=_cancel_edit)
         
-        # 如果没有用户显示提示信息
-        if len(users_df) == 0:
-            st.info('没有找到符合条件的用户')
-    
-    with col2:
-        # 判断是否处于编辑模式
-        if 'editing_user' in st.session_state:
-            # 编辑用户表单
-            st.subheader('编辑用户')
-            edit_name = st.text_input('姓名', value=st.session_state['edit_name'], key='edit_name_input')
-            edit_department = st.text_input('部门', value=st.session_state['edit_department'], key='edit_department_input')
-            edit_position = st.text_input('岗位', value=st.session_state['edit_position'], key='edit_position_input')
-            edit_employee_id = st.text_input('工号', value=st.session_state['edit_employee_id'], key='edit_employee_id_input')
-            edit_role = st.selectbox('角色', ['user', 'admin'], index=0 if st.session_state['edit_role'] == 'user' else 1, key='edit_role_input')
-            edit_password = st.text_input('新密码 (留空不修改)', type='password', key='edit_password_input')
-            
-            col1_btn, col2_btn = st.columns(2)
-            with col1_btn:
-                if st.button('保存修改', key='save_edit_btn'):
-                    if db.update_user(st.session_state['editing_user'], edit_name, edit_department, edit_position, edit_employee_id, edit_role, edit_password):
-                        st.success('用户信息更新成功')
-                        del st.session_state['editing_user']
+        with col3_btn:
+            if st.session_state['editing_user'] != 'admin':
+                if st.button('删除', key='delete_user_btn'):
+                    if db.delete_user(st.session_state['editing_user']):
+                        st.success('用户删除成功')
+                        _clear_user_selection()
                         st.rerun()
-            
-            with col2_btn:
-                if st.button('取消', key='cancel_edit_btn'):
-                    del st.session_state['editing_user']
+    else:
+        # 新增用户表单
+        st.subheader('新增用户')
+        new_username = st.text_input('用户名', key='add_user_username')
+        new_name = st.text_input('姓名', key='add_user_name')
+        new_password = st.text_input('密码', type='password', key='add_user_password')
+        new_role = st.selectbox('角色', ['user', 'admin'], key='add_user_role')
+        new_department = st.text_input('部门', key='add_user_department')
+        new_position = st.text_input('岗位', key='add_user_position')
+        new_employee_id = st.text_input('工号', key='add_user_employee_id')
+        
+        if st.button('添加用户', key='add_user_btn'):
+            if new_username and new_name and new_password:
+                if db.add_user(new_username, new_name, new_password, new_role, new_department, new_position, new_employee_id):
+                    st.success('用户添加成功')
+                    st.session_state.setdefault('password_jobs', []).append(new_username)
                     st.rerun()
-        else:
-            # 新增用户表单
-            st.subheader('新增用户')
-            new_username = st.text_input('用户名', key='add_user_username')
-            new_name = st.text_input('姓名', key='add_user_name')
-            new_password = st.text_input('密码', type='password', key='add_user_password')
-            new_role = st.selectbox('角色', ['user', 'admin'], key='add_user_role')
-            new_department = st.text_input('部门', key='add_user_department')
-            new_position = st.text_input('岗位', key='add_user_position')
-            new_employee_id = st.text_input('工号', key='add_user_employee_id')
-            
-            if st.button('添加用户', key='add_user_btn'):
-                if new_username and new_name and new_password:
-                    if db.add_user(new_username, new_name, new_password, new_role, new_department, new_position, new_employee_id):
-                        st.success('用户添加成功')
-                        st.rerun()
-                else:
-                    st.warning('请填写必要信息（用户名、姓名、密码）')
\ No newline at end of file
+            else:
+                st.warning('请填写必要信息（用户名、姓名、密码）')
+        
+        # 批量导入和导出
+        user_import.user_import_section()
+        export.export_section('users')
@@ -0,0 +1,150 @@
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+import query_trace
+
+# 单写线程：所有会话的写操作排队交给同一个线程执行，多个写操作合并为一个事务提交（组提交）
+# 读操作仍从连接池借连接并发执行（WAL 模式下读写互不阻塞）
+
+# 一次提交最多合并的写操作数
+WRITE_BATCH_SIZE = int(os.environ.get('KPI_WRITE_BATCH_SIZE', '64'))
+# 统计等待时间时保留的最近写操作数
+STATS_WINDOW = 1000
+
+class Writer:
+    # on_commit(fns) 在每次提交之后、写操作结果返回之前调用，fns 为本次提交成功的写操作
+    def __init__(self, pool, batch_size=WRITE_BATCH_SIZE, on_commit=None):
+        self.pool = pool
+        self.batch_size = batch_size
+        self.on_commit = on_commit
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._conn_lock = threading.Lock()
+        self._waits = deque(maxlen=STATS_WINDOW)
+        self._counts = {'submitted': 0, 'completed': 0, 'failed': 0, 'batches': 0, 'batched': 0, 'commit_ms': 0.0}
+        self._thread = threading.Thread(target=self._run, name='kpi-writer', daemon=True)
+        self._thread.start()
+
+    # 提交写操作 fn(conn, *args)，返回 Future；结果在所在事务提交之后才可用
+    def submit(self, fn, *args, **kwargs):
+        if threading.current_thread() is self._thread:
+            raise RuntimeError('写操作中不能再提交写操作')
+        future = Future()
+        with self._lock:
+            self._counts['submitted'] += 1
+        # 写线程沿用提交者的查询记录，性能面板中仍能看到写操作的语句
+        self._queue.put((fn, args, kwargs, future, time.perf_counter(), query_trace.current_trace()))
+        return future
+
+    # 提交写操作并等待结果，写操作抛出的异常原样抛给调用方
+    def run(self, fn, *args, **kwargs):
+        return self.submit(fn, *args, **kwargs).result()
+
+    def _run(self):
+        conn = self.pool.acquire()
+        self._conn = conn
+        try:
+            while True:
+                batch = [self._queue.get()]
+                if batch[0] is None:
+                    return
+                while len(batch) < self.batch_size:
+                    try:
+                        job = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if job is None:
+                        self._queue.put(None)
+                        break
+                    batch.append(job)
+                with self._conn_lock:
+                    self._execute(conn, batch)
+        finally:
+            self._conn = None
+            self.pool.release(conn)
+
+    # 在一个事务中依次执行一批写操作，每个写操作使用一个保存点，失败时只回滚它自己
+    def _execute(self, conn, batch):
+        done = []
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            for fn, args, kwargs, future, submitted, trace in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                wait = time.perf_counter() - submitted
+                with self._lock:
+                    self._waits.append(wait)
+                conn.execute('SAVEPOINT write_job')
+                try:
+                    with query_trace.use_trace(trace):
+                        result = fn(conn, *args, **kwargs)
+                except Exception as e:
+                    conn.execute('ROLLBACK TO SAVEPOINT write_job')
+                    conn.execute('RELEASE SAVEPOINT write_job')
+                    future.set_exception(e)
+                    with self._lock:
+                        self._counts['failed'] += 1
+                else:
+                    conn.execute('RELEASE SAVEPOINT write_job')
+                    done.append((fn, future, result))
+            started = time.perf_counter()
+            conn.commit()
+            commit_ms = (time.perf_counter() - started) * 1000
+        except Exception as e:
+            if conn.in_transaction:
+                conn.rollback()
+            failed = [future for _, _, _, future, _, _ in batch if not future.done()]
+            for future in failed:
+                future.set_exception(e)
+            with self._lock:
+                self._counts['failed'] += len(failed)
+            return
+        with self._lock:
+            self._counts['completed'] += len(done)
+            self._counts['batches'] += 1
+            self._counts['batched'] += len(batch)
+            self._counts['commit_ms'] += commit_ms
+        if self.on_commit is not None:
+            self.on_commit([fn for fn, _, _ in done])
+        for _, future, result in done:
+            future.set_result(result)
+
+    # 写线程连接的数据版本（SQLite 的 PRAGMA data_version），只在其他连接提交修改后变化，本线程的写入不改变它
+    # 写线程正在执行写操作时返回 None；之前其他连接的修改在下一次检查时仍能发现
+    def data_version(self):
+        if not self._conn_lock.acquire(blocking=False):
+            return None
+        try:
+            if self._conn is None:
+                return None
+            return self.pool.data_version(self._conn)
+        finally:
+            self._conn_lock.release()
+
+    # 队列深度、提交次数和最近写操作的排队等待时间
+    def stats(self):
+        with self._lock:
+            counts = dict(self._counts)
+            waits = sorted(self._waits)
+        batches = counts.pop('batches')
+        batched = counts.pop('batched')
+        commit_ms = counts.pop('commit_ms')
+        return dict(
+            counts,
+            queue_depth=self._queue.qsize(),
+            batches=batches,
+            average_batch_size=round(batched / batches, 2) if batches else 0.0,
+            average_commit_ms=round(commit_ms / batches, 3) if batches else 0.0,
+            average_wait_ms=round(sum(waits) / len(waits) * 1000, 3) if waits else 0.0,
+            p95_wait_ms=round(waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000, 3) if waits else 0.0,
+            max_wait_ms=round(waits[-1] * 1000, 3) if waits else 0.0,
+        )
+
+    # 处理完已提交的写操作后停止写线程
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()